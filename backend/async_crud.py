@@ -0,0 +1,257 @@
+"""
+Async CRUD operations for the hot request paths of Online Exam System
+Mirrors the matching functions in crud.py on an AsyncSession
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, and_, column, exists, func, insert, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+from uuid import UUID
+from . import models
+from . import schemas
+from .crud import event_rows, select_columns, submission_context_query
+
+async def _get(db: AsyncSession, model, id: UUID, fields: Optional[List[str]] = None):
+    if not fields:
+        return await db.scalar(select(model).where(model.id == id))
+    result = await db.execute(select(*select_columns(model, fields)).where(model.id == id))
+    return result.first()
+
+# Session lookup
+async def get_user_session(db: AsyncSession, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.UserSession]:
+    return await _get(db, models.UserSession, id, fields)
+
+async def get_exam_session(db: AsyncSession, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.ExamSession]:
+    return await _get(db, models.ExamSession, id, fields)
+
+async def get_user_role(db: AsyncSession, id: UUID) -> Optional[models.UserRole]:
+    return await db.scalar(select(models.User.role).where(models.User.id == id))
+
+async def get_user_session_by_token(db: AsyncSession, token: str) -> Optional[models.UserSession]:
+    return await db.scalar(select(models.UserSession).where(models.UserSession.session_token == token))
+
+async def get_exam_session_by_token(db: AsyncSession, token: str) -> Optional[models.ExamSession]:
+    return await db.scalar(select(models.ExamSession).where(models.ExamSession.session_token == token))
+
+# Submission create
+async def create_submission(db: AsyncSession, obj_in: schemas.SubmissionCreate) -> models.Submission:
+    db_obj = models.Submission(**obj_in.dict())
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+# Event ingest
+async def create_exam_event(db: AsyncSession, obj_in: schemas.ExamEventCreate) -> models.ExamEvent:
+    db_obj = models.ExamEvent(**obj_in.dict())
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+async def create_submission_event(db: AsyncSession, obj_in: schemas.SubmissionEventCreate) -> models.SubmissionEvent:
+    db_obj = models.SubmissionEvent(**obj_in.dict())
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+async def _create_events_bulk(db: AsyncSession, model, parent_model, parent_key: str, objs_in: list) -> List[Optional[UUID]]:
+    """
+    Insert many events with one parent lookup and one multi-row INSERT.
+    Returns the new id per input item, or None where the parent row is gone.
+    Parents are read FOR KEY SHARE so they cannot be deleted before the
+    commit; should the INSERT still hit a foreign key violation, lookup and
+    insert are redone once, and if that fails too every item is rejected.
+    """
+    parent_ids = {getattr(obj_in, parent_key) for obj_in in objs_in}
+    for _ in range(2):
+        known = set(await db.scalars(
+            select(parent_model.id).where(parent_model.id.in_(parent_ids)).with_for_update(key_share=True)
+        )) if parent_ids else set()
+        rows, ids = event_rows(objs_in, parent_key, known)
+        try:
+            if rows:
+                await db.execute(insert(model), rows)
+            await db.commit()
+            return ids
+        except IntegrityError:
+            await db.rollback()
+    return [None] * len(objs_in)
+
+async def create_exam_events_bulk(db: AsyncSession, objs_in: List[schemas.ExamEventCreate]) -> List[Optional[UUID]]:
+    return await _create_events_bulk(db, models.ExamEvent, models.ExamSession, "exam_session_id", objs_in)
+
+async def create_submission_events_bulk(db: AsyncSession, objs_in: List[schemas.SubmissionEventCreate]) -> List[Optional[UUID]]:
+    return await _create_events_bulk(db, models.SubmissionEvent, models.Submission, "submission_id", objs_in)
+
+# Grading dispatcher
+async def claim_pending_submissions(db: AsyncSession, limit: int, stale_after: float) -> List[models.Submission]:
+    """
+    Lock up to `limit` submissions to dispatch (skipping rows other workers
+    hold) and mark them RUNNING: PENDING ones, plus RUNNING ones that still
+    have no result `stale_after` seconds after they were claimed (their
+    dispatcher died before writing results). The caller commits.
+    """
+    S = models.Submission
+    abandoned = and_(
+        S.status == models.SubmissionStatus.RUNNING,
+        S.updated_at < func.now() - timedelta(seconds=stale_after),
+        ~exists().where(models.SubmissionResult.submission_id == S.id),
+    )
+    submissions = list(await db.scalars(
+        select(S)
+        .where(or_(S.status == models.SubmissionStatus.PENDING, abandoned))
+        .order_by(S.submitted_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ))
+    for submission in submissions:
+        submission.status = models.SubmissionStatus.RUNNING
+        # Also restamps re-claimed rows, whose status does not change
+        submission.updated_at = func.now()
+    return submissions
+
+async def lock_unresulted_submissions(db: AsyncSession, ids: List[UUID]) -> set:
+    """
+    Of `ids`, the submissions still RUNNING without a result, locked so that
+    only one dispatcher writes their results. Rows another worker holds are skipped.
+    """
+    if not ids:
+        return set()
+    S = models.Submission
+    return set(await db.scalars(
+        select(S.id)
+        .where(
+            S.id.in_(ids),
+            S.status == models.SubmissionStatus.RUNNING,
+            ~exists().where(models.SubmissionResult.submission_id == S.id),
+        )
+        .with_for_update(skip_locked=True)
+    ))
+
+async def get_questions_by_ids(db: AsyncSession, ids: set) -> dict:
+    questions = await db.scalars(select(models.Question).where(models.Question.id.in_(ids)))
+    return {question.id: question for question in questions}
+
+async def get_test_cases_by_question(db: AsyncSession, question_ids: set) -> dict:
+    test_cases = await db.scalars(
+        select(models.QuestionTestCase)
+        .where(models.QuestionTestCase.question_id.in_(question_ids))
+        .order_by(models.QuestionTestCase.created_at, models.QuestionTestCase.id)
+    )
+    grouped: dict = {question_id: [] for question_id in question_ids}
+    for test_case in test_cases:
+        grouped[test_case.question_id].append(test_case)
+    return grouped
+
+async def create_submission_results_bulk(db: AsyncSession, rows: List[dict]) -> None:
+    if rows:
+        await db.execute(insert(models.SubmissionResult), rows)
+
+async def get_graded_results(db: AsyncSession, keys: set, statuses: set, fields: tuple) -> Dict[str, dict]:
+    """
+    `fields` of the latest result with one of `statuses` for each grading key.
+    """
+    if not keys:
+        return {}
+    R = models.SubmissionResult
+    rows = await db.execute(
+        select(R.grading_key, *(getattr(R, field) for field in fields))
+        .where(R.grading_key.in_(keys), R.status.in_(statuses))
+        .order_by(R.grading_key, R.evaluated_at.desc())
+        .distinct(R.grading_key)
+    )
+    return {row.grading_key: {field: getattr(row, field) for field in fields} for row in rows}
+
+async def claim_running_results(db: AsyncSession, limit: int, lease: float) -> List[models.SubmissionResult]:
+    """
+    Lock up to `limit` results still waiting on the judge that were not
+    polled in the last `lease` seconds, least recently polled first, and
+    restamp their updated_at. Results that stay unfinished thus rotate to the
+    back instead of filling every claim. The caller commits.
+    """
+    R = models.SubmissionResult
+    results = list(await db.scalars(
+        select(R)
+        .where(
+            R.status == models.ExecutionStatus.RUNNING,
+            R.test_results.has_key("cases"),
+            R.updated_at < func.now() - timedelta(seconds=lease),
+        )
+        .order_by(R.updated_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ))
+    if results:
+        await db.execute(
+            update(R).where(R.id.in_([r.id for r in results])).values(updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    return results
+
+async def lock_running_results(db: AsyncSession, ids: List[UUID]) -> set:
+    """
+    Of `ids`, the results still RUNNING, locked for writing back verdicts.
+    Rows another worker holds are skipped.
+    """
+    if not ids:
+        return set()
+    R = models.SubmissionResult
+    return set(await db.scalars(
+        select(R.id)
+        .where(R.id.in_(ids), R.status == models.ExecutionStatus.RUNNING)
+        .with_for_update(skip_locked=True)
+    ))
+
+async def update_submission_results_bulk(db: AsyncSession, rows: List[dict]) -> None:
+    # Each row carries its primary key; executes as one executemany UPDATE
+    if rows:
+        await db.execute(update(models.SubmissionResult), rows)
+
+async def set_submissions_status(db: AsyncSession, ids: List[UUID], status: models.SubmissionStatus) -> None:
+    if ids:
+        await db.execute(
+            update(models.Submission).where(models.Submission.id.in_(ids)).values(status=status)
+        )
+
+async def get_submission_contexts(db: AsyncSession, ids: set) -> dict:
+    if not ids:
+        return {}
+    return {row.id: row for row in await db.execute(submission_context_query(ids))}
+
+# Heartbeats
+async def touch_exam_sessions(db: AsyncSession, seen: Dict[UUID, datetime]) -> None:
+    """
+    Set last_activity_at for many sessions in one UPDATE ... FROM (VALUES ...),
+    never moving it backwards. updated_at is left alone: a heartbeat is not an edit.
+    """
+    if not seen:
+        return
+    table = models.ExamSession.__table__
+    heartbeats = values(
+        column("id", PGUUID(as_uuid=True)), column("seen_at", DateTime(timezone=True)), name="heartbeats"
+    ).data(list(seen.items()))
+    await db.execute(
+        update(table)
+        .where(table.c.id == heartbeats.c.id)
+        .where(or_(table.c.last_activity_at.is_(None), table.c.last_activity_at < heartbeats.c.seen_at))
+        .values(last_activity_at=heartbeats.c.seen_at, updated_at=table.c.updated_at)
+    )
+
+async def get_idle_exam_sessions(db: AsyncSession, exam_id: UUID, cutoff: datetime) -> list:
+    """
+    ACTIVE sessions of an exam with no recorded activity since `cutoff`,
+    least recently active first. A session that never beat counts from its start.
+    """
+    S = models.ExamSession
+    seen = func.coalesce(S.last_activity_at, S.started_at, S.created_at)
+    result = await db.execute(
+        select(S.id, S.student_id, seen.label("last_activity_at"))
+        .where(S.exam_id == exam_id, S.status == models.SessionStatus.ACTIVE, seen < cutoff)
+        .order_by(seen)
+    )
+    return result.all()
\ No newline at end of file
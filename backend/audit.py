@@ -0,0 +1,181 @@
+"""
+Write-behind audit log buffer for Online Exam System
+
+Requests enqueue AuditLog rows into a bounded in-process queue and return;
+a background thread writes them with multi-row INSERTs every
+AUDIT_FLUSH_INTERVAL_MS or once AUDIT_FLUSH_BATCH entries are waiting.
+When the queue is full, AUDIT_OVERFLOW decides: "block" waits up to
+AUDIT_ENQUEUE_TIMEOUT seconds for room, "drop" rejects at once. Either way
+an entry that does not fit is counted and `record` returns None. A batch
+the database rejects (constraint or data errors) is split in halves until
+the offending entries are isolated; those are logged and dropped, the rest
+is written. The queue is drained on shutdown.
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import uuid4
+
+from sqlalchemy import exc, insert
+from sqlalchemy.engine import Engine
+
+from . import crud, metrics, models, schemas
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+ENQUEUED = metrics.REGISTRY.register(metrics.Counter("audit_entries_enqueued_total", "Audit entries accepted into the buffer"))
+DROPPED = metrics.REGISTRY.register(metrics.Counter("audit_entries_dropped_total", "Audit entries lost", ("reason",)))
+FLUSHED = metrics.REGISTRY.register(metrics.Counter("audit_entries_flushed_total", "Audit entries written to the database"))
+FLUSH_DURATION = metrics.REGISTRY.register(metrics.LabeledHistogram("audit_flush_seconds", "Time per audit batch INSERT"))
+
+
+class AuditWriter:
+    def __init__(self, bind: Engine, max_entries: int, batch_size: int, flush_interval: float,
+                 overflow: str = "block", enqueue_timeout: float = 0.05):
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+        self.bind = bind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_entries)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def enqueue(self, row: dict) -> bool:
+        try:
+            if self.overflow == "block":
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            DROPPED.inc(("buffer_full",))
+            return False
+        ENQUEUED.inc()
+        return True
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Flush everything still queued, then stop the writer thread.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _take(self, count: int, wait: bool) -> List[dict]:
+        # Up to `count` rows, waiting at most one flush interval for them
+        rows = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < count:
+            try:
+                if not wait:
+                    rows.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _insert(self, rows: List[dict]) -> None:
+        start = time.perf_counter()
+        with self.bind.begin() as conn:
+            conn.execute(insert(models.AuditLog), rows)
+        FLUSH_DURATION.observe((), time.perf_counter() - start)
+        FLUSHED.inc(amount=len(rows))
+
+    def _flush(self, rows: List[dict]) -> List[dict]:
+        """
+        Write `rows`, bisecting around entries the database rejects. Returns
+        the rows still unwritten after a transient failure, to be retried.
+        """
+        pending = [rows]
+        while pending:
+            chunk = pending.pop()
+            try:
+                self._insert(chunk)
+            except (exc.IntegrityError, exc.DataError) as error:
+                if len(chunk) > 1:
+                    middle = len(chunk) // 2
+                    pending += [chunk[middle:], chunk[:middle]]
+                    continue
+                # e.g. a user_id whose user was deleted meanwhile
+                DROPPED.inc(("rejected",))
+                logger.error("Dropped audit entry rejected by the database: %r (%s)", chunk[0], error.orig)
+            except Exception:
+                unwritten = chunk + [row for part in reversed(pending) for row in part]
+                logger.exception("Writing %d audit entries failed", len(unwritten))
+                return unwritten
+        return []
+
+    def _run(self) -> None:
+        # A transient failure keeps the batch for retry; meanwhile the full queue applies back-pressure
+        batch: List[dict] = []
+        while True:
+            stopping = self._stopping.is_set()
+            batch.extend(self._take(self.batch_size - len(batch), wait=not stopping))
+            if not batch:
+                if stopping:
+                    return
+                continue
+            batch = self._flush(batch)
+            if not batch:
+                continue
+            if stopping:
+                DROPPED.inc(("shutdown",), len(batch) + self._queue.qsize())
+                logger.error("Dropped %d audit entries at shutdown", len(batch) + self._queue.qsize())
+                return
+            time.sleep(self.flush_interval)
+
+
+_writer = AuditWriter(
+    engine,
+    max_entries=settings.audit_buffer_size,
+    batch_size=settings.audit_flush_batch,
+    flush_interval=settings.audit_flush_interval_ms / 1000,
+    overflow=settings.audit_overflow,
+    enqueue_timeout=settings.audit_enqueue_timeout,
+)
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    "audit_buffer_entries", "Audit entries waiting to be written", (), lambda: {(): len(_writer)}
+))
+
+
+def record(obj_in: schemas.AuditLogCreate) -> Optional[schemas.AuditLog]:
+    """
+    Queue an audit entry for writing. id and created_at are assigned now, so
+    the stored row reflects when the action happened, not when it was flushed.
+    Returns None if the buffer had no room.
+    """
+    row = crud.audit_log_values(obj_in.dict())
+    row.update(id=uuid4(), created_at=datetime.now(timezone.utc))
+    if not _writer.enqueue(row):
+        return None
+    return schemas.AuditLog(**row)
+
+
+def start() -> None:
+    _writer.start()
+
+
+def stop() -> None:
+    _writer.stop()
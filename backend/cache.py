@@ -0,0 +1,119 @@
+"""
+In-process caches for Online Exam System
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count.
+    Counts hits and misses of `get`.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Membership only: neither counted nor refreshed, and expiry is not checked
+        return key in self._data
+
+
+class TTLCache(LRUCache):
+    """
+    LRU cache whose entries also expire after a per-entry time-to-live.
+    """
+
+    _MISSING = object()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = super().get(key, self._MISSING)
+        if entry is self._MISSING:
+            return default
+        deadline, value = entry
+        if deadline <= time.monotonic():
+            with self._lock:
+                # Count an expired entry as a miss, not a hit
+                self.hits -= 1
+                self.misses += 1
+                if self._data.get(key) is entry:
+                    del self._data[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = 60.0) -> None:
+        super().set(key, (time.monotonic() + ttl, value))
+
+
+class KeyedLock:
+    """
+    One lock per key, so work on different keys never waits on each other.
+    Locks are created on first use and discarded once nobody holds or waits
+    for them; the map itself is guarded by a lock held only for lookups.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, list] = {}  # key -> [lock, holders and waiters]
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: Hashable, blocking: bool = True) -> Iterator[bool]:
+        """
+        Hold the lock of `key` for the block. Yields False, without holding
+        it, if `blocking` is False and the lock is taken.
+        """
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
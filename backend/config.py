@@ -11,23 +11,157 @@ def _getenv(name: str, default: str | None = None, required: bool = False) -> st
         raise RuntimeError(f"Missing required environment variable: {name}")
     return val if val is not None else ""
 
+def _async_url(url: str) -> str:
+    # Same database, asyncpg driver (used by the async engine)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
 @dataclass(frozen=True)
 class Settings:
     app_env: str
     database_url: str
+    async_database_url: str
+    database_replica_urls: list[str]
+    replica_max_lag_seconds: float
+    replica_lag_check_interval: float
+    read_your_writes_seconds: float
     cors_origins: list[str]
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    db_statement_timeout_ms: int
+    query_budget: int
+    query_repeat_threshold: int
+    query_budget_strict: bool
+    judge0_url: str
+    judge0_auth_token: str
+    judge0_max_cpu_time_limit: float
+    grading_batch_size: int
+    grading_concurrency: int
+    grading_poll_interval: float
+    grading_timeout: float
+    grading_cache_size: int
+    session_cache_size: int
+    session_cache_ttl: float
+    session_cache_negative_ttl: float
+    dashboard_cache_size: int
+    dashboard_cache_ttl: float
+    leaderboard_penalty_minutes: int
+    partition_precreate_months: int
+    partition_retention_days: int
+    partition_maintenance_interval: float
+    audit_buffer_size: int
+    audit_flush_batch: int
+    audit_flush_interval_ms: int
+    audit_overflow: str
+    audit_enqueue_timeout: float
+    heartbeat_flush_interval: float
+    heartbeat_idle_seconds: float
+    sse_queue_size: int
+    sse_keepalive_seconds: float
+    web_concurrency: int
+    graceful_timeout: float
 
 def get_settings() -> Settings:
     app_env = _getenv("APP_ENV", default="production")
     database_url = _getenv("DATABASE_URL", required=True)
+    async_database_url = _getenv("ASYNC_DATABASE_URL", default="") or _async_url(database_url)
+    replicas_raw = _getenv("DATABASE_REPLICA_URLS", default="")
+    database_replica_urls = [u.strip() for u in replicas_raw.split(",") if u.strip()]
+    replica_max_lag_seconds = float(_getenv("REPLICA_MAX_LAG_SECONDS", default="5"))
+    replica_lag_check_interval = float(_getenv("REPLICA_LAG_CHECK_INTERVAL", default="2"))
+    read_your_writes_seconds = float(_getenv("READ_YOUR_WRITES_SECONDS", default="5"))
 
     cors_raw = _getenv("CORS_ORIGINS", default="")
     cors_origins = [o.strip() for o in cors_raw.split(",") if o.strip()] if cors_raw else []
 
+    db_pool_size = int(_getenv("DB_POOL_SIZE", default="5"))
+    db_max_overflow = int(_getenv("DB_MAX_OVERFLOW", default="10"))
+    db_pool_timeout = float(_getenv("DB_POOL_TIMEOUT", default="30"))
+    db_pool_recycle = int(_getenv("DB_POOL_RECYCLE", default="1800"))
+    db_statement_timeout_ms = int(_getenv("DB_STATEMENT_TIMEOUT_MS", default="0"))
+
+    query_budget = int(_getenv("QUERY_BUDGET", default="50"))
+    query_repeat_threshold = int(_getenv("QUERY_REPEAT_THRESHOLD", default="10"))
+    query_budget_strict = _getenv("QUERY_BUDGET_STRICT", default="false").strip().lower() in ("1", "true", "yes")
+
+    judge0_url = _getenv("JUDGE0_URL", default="").rstrip("/")
+    judge0_auth_token = _getenv("JUDGE0_AUTH_TOKEN", default="")
+    judge0_max_cpu_time_limit = float(_getenv("JUDGE0_MAX_CPU_TIME_LIMIT", default="15"))
+    grading_batch_size = int(_getenv("GRADING_BATCH_SIZE", default="20"))
+    grading_concurrency = int(_getenv("GRADING_CONCURRENCY", default="4"))
+    grading_poll_interval = float(_getenv("GRADING_POLL_INTERVAL", default="1.0"))
+    grading_timeout = float(_getenv("GRADING_TIMEOUT", default="300"))
+    grading_cache_size = int(_getenv("GRADING_CACHE_SIZE", default="10000"))
+    session_cache_size = int(_getenv("SESSION_CACHE_SIZE", default="100000"))
+    session_cache_ttl = float(_getenv("SESSION_CACHE_TTL", default="30"))
+    session_cache_negative_ttl = float(_getenv("SESSION_CACHE_NEGATIVE_TTL", default="5"))
+    dashboard_cache_size = int(_getenv("DASHBOARD_CACHE_SIZE", default="10000"))
+    dashboard_cache_ttl = float(_getenv("DASHBOARD_CACHE_TTL", default="60"))
+    leaderboard_penalty_minutes = int(_getenv("LEADERBOARD_PENALTY_MINUTES", default="20"))
+    partition_precreate_months = int(_getenv("PARTITION_PRECREATE_MONTHS", default="3"))
+    partition_retention_days = int(_getenv("PARTITION_RETENTION_DAYS", default="365"))
+    partition_maintenance_interval = float(_getenv("PARTITION_MAINTENANCE_INTERVAL", default="3600"))
+    audit_buffer_size = int(_getenv("AUDIT_BUFFER_SIZE", default="10000"))
+    audit_flush_batch = int(_getenv("AUDIT_FLUSH_BATCH", default="500"))
+    audit_flush_interval_ms = int(_getenv("AUDIT_FLUSH_INTERVAL_MS", default="200"))
+    audit_overflow = _getenv("AUDIT_OVERFLOW", default="block").strip().lower()
+    audit_enqueue_timeout = float(_getenv("AUDIT_ENQUEUE_TIMEOUT", default="0.05"))
+    heartbeat_flush_interval = float(_getenv("HEARTBEAT_FLUSH_INTERVAL", default="5"))
+    heartbeat_idle_seconds = float(_getenv("HEARTBEAT_IDLE_SECONDS", default="60"))
+    sse_queue_size = int(_getenv("SSE_QUEUE_SIZE", default="100"))
+    sse_keepalive_seconds = float(_getenv("SSE_KEEPALIVE_SECONDS", default="15"))
+    web_concurrency = int(_getenv("WEB_CONCURRENCY", default="0"))
+    graceful_timeout = float(_getenv("GRACEFUL_TIMEOUT", default="30"))
+
     return Settings(
         app_env=app_env,
         database_url=database_url,
+        async_database_url=async_database_url,
+        database_replica_urls=database_replica_urls,
+        replica_max_lag_seconds=replica_max_lag_seconds,
+        replica_lag_check_interval=replica_lag_check_interval,
+        read_your_writes_seconds=read_your_writes_seconds,
         cors_origins=cors_origins,
+        db_pool_size=db_pool_size,
+        db_max_overflow=db_max_overflow,
+        db_pool_timeout=db_pool_timeout,
+        db_pool_recycle=db_pool_recycle,
+        db_statement_timeout_ms=db_statement_timeout_ms,
+        query_budget=query_budget,
+        query_repeat_threshold=query_repeat_threshold,
+        query_budget_strict=query_budget_strict,
+        judge0_url=judge0_url,
+        judge0_auth_token=judge0_auth_token,
+        judge0_max_cpu_time_limit=judge0_max_cpu_time_limit,
+        grading_batch_size=grading_batch_size,
+        grading_concurrency=grading_concurrency,
+        grading_poll_interval=grading_poll_interval,
+        grading_timeout=grading_timeout,
+        grading_cache_size=grading_cache_size,
+        session_cache_size=session_cache_size,
+        session_cache_ttl=session_cache_ttl,
+        session_cache_negative_ttl=session_cache_negative_ttl,
+        dashboard_cache_size=dashboard_cache_size,
+        dashboard_cache_ttl=dashboard_cache_ttl,
+        leaderboard_penalty_minutes=leaderboard_penalty_minutes,
+        partition_precreate_months=partition_precreate_months,
+        partition_retention_days=partition_retention_days,
+        partition_maintenance_interval=partition_maintenance_interval,
+        audit_buffer_size=audit_buffer_size,
+        audit_flush_batch=audit_flush_batch,
+        audit_flush_interval_ms=audit_flush_interval_ms,
+        audit_overflow=audit_overflow,
+        audit_enqueue_timeout=audit_enqueue_timeout,
+        heartbeat_flush_interval=heartbeat_flush_interval,
+        heartbeat_idle_seconds=heartbeat_idle_seconds,
+        sse_queue_size=sse_queue_size,
+        sse_keepalive_seconds=sse_keepalive_seconds,
+        web_concurrency=web_concurrency,
+        graceful_timeout=graceful_timeout,
     )
 
 settings = get_settings()
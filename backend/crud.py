@@ -3,18 +3,53 @@ CRUD operations for Online Exam System
 Generated from SQLAlchemy models
 """
 
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from uuid import UUID
+from sqlalchemy import String, and_, cast, distinct, exists, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Iterator, List, Optional, Tuple
+from uuid import UUID, uuid4
 from . import models
 from . import schemas
+from .pagination import AttemptCursor, Cursor, ResultCursor, paginate
+
+# Always selected so projected rows stay addressable and pageable
+KEY_COLUMNS = ("id", "created_at")
+
+def select_columns(model, fields: List[str]) -> list:
+    """
+    Columns for a sparse fieldset: the requested ones plus KEY_COLUMNS.
+    """
+    names = list(KEY_COLUMNS) + [f for f in fields if f not in KEY_COLUMNS]
+    return [getattr(model, name) for name in names]
+
+def _query(db: Session, model, fields: Optional[List[str]] = None):
+    # Full ORM rows, or only the requested columns so heavy ones never leave Postgres
+    if not fields:
+        return db.query(model)
+    return db.query(*select_columns(model, fields))
+
+def _with_cursor_fields(fields: Optional[List[str]], cursor_type) -> Optional[List[str]]:
+    # Sparse rows still need the columns their next-page cursor is built from
+    return fields and list(dict.fromkeys([*fields, *cursor_type._fields]))
+
+def _filter_by(query, model, **filters):
+    # Equality filters from typed query parameters; None means "not filtered"
+    for name, value in filters.items():
+        if value is not None:
+            query = query.filter(getattr(model, name) == value)
+    return query
 
 # User CRUD operations
-def get_user(db: Session, id: UUID) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.id == id).first()
+def get_user(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.User]:
+    return _query(db, models.User, fields).filter(models.User.id == id).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    role: Optional[models.UserRole] = None, is_active: Optional[bool] = None,
+) -> List[models.User]:
+    query = _filter_by(_query(db, models.User, fields), models.User, role=role, is_active=is_active)
+    return paginate(query, models.User, skip, limit, after).all()
 
 def create_user(db: Session, obj_in: schemas.UserCreate) -> models.User:
     db_obj = models.User(**obj_in.dict())
@@ -40,11 +75,15 @@ def delete_user(db: Session, id: UUID) -> Optional[models.User]:
     return db_obj
 
 # UserSession CRUD operations
-def get_user_session(db: Session, id: UUID) -> Optional[models.UserSession]:
-    return db.query(models.UserSession).filter(models.UserSession.id == id).first()
+def get_user_session(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.UserSession]:
+    return _query(db, models.UserSession, fields).filter(models.UserSession.id == id).first()
 
-def get_user_sessions(db: Session, skip: int = 0, limit: int = 100) -> List[models.UserSession]:
-    return db.query(models.UserSession).offset(skip).limit(limit).all()
+def get_user_sessions(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    user_id: Optional[UUID] = None,
+) -> List[models.UserSession]:
+    query = _filter_by(_query(db, models.UserSession, fields), models.UserSession, user_id=user_id)
+    return paginate(query, models.UserSession, skip, limit, after).all()
 
 def create_user_session(db: Session, obj_in: schemas.UserSessionCreate) -> models.UserSession:
     db_obj = models.UserSession(**obj_in.dict())
@@ -70,11 +109,15 @@ def delete_user_session(db: Session, id: UUID) -> Optional[models.UserSession]:
     return db_obj
 
 # UserToken CRUD operations
-def get_user_token(db: Session, id: UUID) -> Optional[models.UserToken]:
-    return db.query(models.UserToken).filter(models.UserToken.id == id).first()
+def get_user_token(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.UserToken]:
+    return _query(db, models.UserToken, fields).filter(models.UserToken.id == id).first()
 
-def get_user_tokens(db: Session, skip: int = 0, limit: int = 100) -> List[models.UserToken]:
-    return db.query(models.UserToken).offset(skip).limit(limit).all()
+def get_user_tokens(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    user_id: Optional[UUID] = None, token_type: Optional[str] = None,
+) -> List[models.UserToken]:
+    query = _filter_by(_query(db, models.UserToken, fields), models.UserToken, user_id=user_id, token_type=token_type)
+    return paginate(query, models.UserToken, skip, limit, after).all()
 
 def create_user_token(db: Session, obj_in: schemas.UserTokenCreate) -> models.UserToken:
     db_obj = models.UserToken(**obj_in.dict())
@@ -100,11 +143,15 @@ def delete_user_token(db: Session, id: UUID) -> Optional[models.UserToken]:
     return db_obj
 
 # StudentProfile CRUD operations
-def get_student_profile(db: Session, id: UUID) -> Optional[models.StudentProfile]:
-    return db.query(models.StudentProfile).filter(models.StudentProfile.id == id).first()
+def get_student_profile(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.StudentProfile]:
+    return _query(db, models.StudentProfile, fields).filter(models.StudentProfile.id == id).first()
 
-def get_student_profiles(db: Session, skip: int = 0, limit: int = 100) -> List[models.StudentProfile]:
-    return db.query(models.StudentProfile).offset(skip).limit(limit).all()
+def get_student_profiles(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    user_id: Optional[UUID] = None,
+) -> List[models.StudentProfile]:
+    query = _filter_by(_query(db, models.StudentProfile, fields), models.StudentProfile, user_id=user_id)
+    return paginate(query, models.StudentProfile, skip, limit, after).all()
 
 def create_student_profile(db: Session, obj_in: schemas.StudentProfileCreate) -> models.StudentProfile:
     db_obj = models.StudentProfile(**obj_in.dict())
@@ -130,11 +177,15 @@ def delete_student_profile(db: Session, id: UUID) -> Optional[models.StudentProf
     return db_obj
 
 # StudentExamQuestion CRUD operations
-def get_student_exam_question(db: Session, id: UUID) -> Optional[models.StudentExamQuestion]:
-    return db.query(models.StudentExamQuestion).filter(models.StudentExamQuestion.id == id).first()
+def get_student_exam_question(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.StudentExamQuestion]:
+    return _query(db, models.StudentExamQuestion, fields).filter(models.StudentExamQuestion.id == id).first()
 
-def get_student_exam_questions(db: Session, skip: int = 0, limit: int = 100) -> List[models.StudentExamQuestion]:
-    return db.query(models.StudentExamQuestion).offset(skip).limit(limit).all()
+def get_student_exam_questions(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    exam_id: Optional[UUID] = None, student_id: Optional[UUID] = None, question_id: Optional[UUID] = None,
+) -> List[models.StudentExamQuestion]:
+    query = _filter_by(_query(db, models.StudentExamQuestion, fields), models.StudentExamQuestion, exam_id=exam_id, student_id=student_id, question_id=question_id)
+    return paginate(query, models.StudentExamQuestion, skip, limit, after).all()
 
 def create_student_exam_question(db: Session, obj_in: schemas.StudentExamQuestionCreate) -> models.StudentExamQuestion:
     db_obj = models.StudentExamQuestion(**obj_in.dict())
@@ -160,11 +211,15 @@ def delete_student_exam_question(db: Session, id: UUID) -> Optional[models.Stude
     return db_obj
 
 # TeacherProfile CRUD operations
-def get_teacher_profile(db: Session, id: UUID) -> Optional[models.TeacherProfile]:
-    return db.query(models.TeacherProfile).filter(models.TeacherProfile.id == id).first()
+def get_teacher_profile(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.TeacherProfile]:
+    return _query(db, models.TeacherProfile, fields).filter(models.TeacherProfile.id == id).first()
 
-def get_teacher_profiles(db: Session, skip: int = 0, limit: int = 100) -> List[models.TeacherProfile]:
-    return db.query(models.TeacherProfile).offset(skip).limit(limit).all()
+def get_teacher_profiles(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    user_id: Optional[UUID] = None,
+) -> List[models.TeacherProfile]:
+    query = _filter_by(_query(db, models.TeacherProfile, fields), models.TeacherProfile, user_id=user_id)
+    return paginate(query, models.TeacherProfile, skip, limit, after).all()
 
 def create_teacher_profile(db: Session, obj_in: schemas.TeacherProfileCreate) -> models.TeacherProfile:
     db_obj = models.TeacherProfile(**obj_in.dict())
@@ -190,11 +245,15 @@ def delete_teacher_profile(db: Session, id: UUID) -> Optional[models.TeacherProf
     return db_obj
 
 # QuestionCategory CRUD operations
-def get_question_category(db: Session, id: UUID) -> Optional[models.QuestionCategory]:
-    return db.query(models.QuestionCategory).filter(models.QuestionCategory.id == id).first()
+def get_question_category(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.QuestionCategory]:
+    return _query(db, models.QuestionCategory, fields).filter(models.QuestionCategory.id == id).first()
 
-def get_question_categories(db: Session, skip: int = 0, limit: int = 100) -> List[models.QuestionCategory]:
-    return db.query(models.QuestionCategory).offset(skip).limit(limit).all()
+def get_question_categories(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    is_active: Optional[bool] = None,
+) -> List[models.QuestionCategory]:
+    query = _filter_by(_query(db, models.QuestionCategory, fields), models.QuestionCategory, is_active=is_active)
+    return paginate(query, models.QuestionCategory, skip, limit, after).all()
 
 def create_question_category(db: Session, obj_in: schemas.QuestionCategoryCreate) -> models.QuestionCategory:
     db_obj = models.QuestionCategory(**obj_in.dict())
@@ -220,11 +279,39 @@ def delete_question_category(db: Session, id: UUID) -> Optional[models.QuestionC
     return db_obj
 
 # Question CRUD operations
-def get_question(db: Session, id: UUID) -> Optional[models.Question]:
-    return db.query(models.Question).filter(models.Question.id == id).first()
-
-def get_questions(db: Session, skip: int = 0, limit: int = 100) -> List[models.Question]:
-    return db.query(models.Question).offset(skip).limit(limit).all()
+def get_question(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.Question]:
+    return _query(db, models.Question, fields).filter(models.Question.id == id).first()
+
+def get_questions(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    category_id: Optional[UUID] = None, difficulty: Optional[models.Difficulty] = None, is_active: Optional[bool] = None, created_by: Optional[UUID] = None,
+) -> List[models.Question]:
+    query = _filter_by(_query(db, models.Question, fields), models.Question, category_id=category_id, difficulty=difficulty, is_active=is_active, created_by=created_by)
+    return paginate(query, models.Question, skip, limit, after).all()
+
+def search_questions(
+    db: Session, q: str, category_id: Optional[UUID] = None, difficulty: Optional[models.Difficulty] = None,
+    is_active: Optional[bool] = None, skip: int = 0, limit: int = 20,
+) -> list:
+    """
+    Questions matching a web-search style query (quoted phrases, OR, -word),
+    best match first. Served by the GIN index on search_vector; the filters
+    narrow the matches. Heavy text columns are not selected.
+    """
+    Q = models.Question
+    query = func.websearch_to_tsquery(models.QUESTION_SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(Q.search_vector, query).label("rank")
+    stmt = (
+        select(Q.id, Q.category_id, Q.title, Q.description, Q.difficulty, Q.max_score, Q.is_active, rank)
+        .where(Q.search_vector.bool_op("@@")(query))
+    )
+    if category_id is not None:
+        stmt = stmt.where(Q.category_id == category_id)
+    if difficulty is not None:
+        stmt = stmt.where(Q.difficulty == difficulty)
+    if is_active is not None:
+        stmt = stmt.where(Q.is_active == is_active)
+    return db.execute(stmt.order_by(rank.desc(), Q.id).offset(skip).limit(limit)).all()
 
 def create_question(db: Session, obj_in: schemas.QuestionCreate) -> models.Question:
     db_obj = models.Question(**obj_in.dict())
@@ -250,11 +337,11 @@ def delete_question(db: Session, id: UUID) -> Optional[models.Question]:
     return db_obj
 
 # QuestionTestCase CRUD operations
-def get_question_test_case(db: Session, id: UUID) -> Optional[models.QuestionTestCase]:
-    return db.query(models.QuestionTestCase).filter(models.QuestionTestCase.id == id).first()
+def get_question_test_case(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.QuestionTestCase]:
+    return _query(db, models.QuestionTestCase, fields).filter(models.QuestionTestCase.id == id).first()
 
-def get_question_test_cases(db: Session, skip: int = 0, limit: int = 100) -> List[models.QuestionTestCase]:
-    return db.query(models.QuestionTestCase).offset(skip).limit(limit).all()
+def get_question_test_cases(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.QuestionTestCase]:
+    return paginate(_query(db, models.QuestionTestCase, fields), models.QuestionTestCase, skip, limit, after).all()
 
 def create_question_test_case(db: Session, obj_in: schemas.QuestionTestCaseCreate) -> models.QuestionTestCase:
     db_obj = models.QuestionTestCase(**obj_in.dict())
@@ -280,11 +367,11 @@ def delete_question_test_case(db: Session, id: UUID) -> Optional[models.Question
     return db_obj
 
 # Exam CRUD operations
-def get_exam(db: Session, id: UUID) -> Optional[models.Exam]:
-    return db.query(models.Exam).filter(models.Exam.id == id).first()
+def get_exam(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.Exam]:
+    return _query(db, models.Exam, fields).filter(models.Exam.id == id).first()
 
-def get_exams(db: Session, skip: int = 0, limit: int = 100) -> List[models.Exam]:
-    return db.query(models.Exam).offset(skip).limit(limit).all()
+def get_exams(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.Exam]:
+    return paginate(_query(db, models.Exam, fields), models.Exam, skip, limit, after).all()
 
 def create_exam(db: Session, obj_in: schemas.ExamCreate) -> models.Exam:
     db_obj = models.Exam(**obj_in.dict())
@@ -310,11 +397,11 @@ def delete_exam(db: Session, id: UUID) -> Optional[models.Exam]:
     return db_obj
 
 # ExamQuestion CRUD operations
-def get_exam_question(db: Session, id: UUID) -> Optional[models.ExamQuestion]:
-    return db.query(models.ExamQuestion).filter(models.ExamQuestion.id == id).first()
+def get_exam_question(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.ExamQuestion]:
+    return _query(db, models.ExamQuestion, fields).filter(models.ExamQuestion.id == id).first()
 
-def get_exam_questions(db: Session, skip: int = 0, limit: int = 100) -> List[models.ExamQuestion]:
-    return db.query(models.ExamQuestion).offset(skip).limit(limit).all()
+def get_exam_questions(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.ExamQuestion]:
+    return paginate(_query(db, models.ExamQuestion, fields), models.ExamQuestion, skip, limit, after).all()
 
 def create_exam_question(db: Session, obj_in: schemas.ExamQuestionCreate) -> models.ExamQuestion:
     db_obj = models.ExamQuestion(**obj_in.dict())
@@ -340,11 +427,11 @@ def delete_exam_question(db: Session, id: UUID) -> Optional[models.ExamQuestion]
     return db_obj
 
 # ExamRegistration CRUD operations
-def get_exam_registration(db: Session, id: UUID) -> Optional[models.ExamRegistration]:
-    return db.query(models.ExamRegistration).filter(models.ExamRegistration.id == id).first()
+def get_exam_registration(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.ExamRegistration]:
+    return _query(db, models.ExamRegistration, fields).filter(models.ExamRegistration.id == id).first()
 
-def get_exam_registrations(db: Session, skip: int = 0, limit: int = 100) -> List[models.ExamRegistration]:
-    return db.query(models.ExamRegistration).offset(skip).limit(limit).all()
+def get_exam_registrations(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.ExamRegistration]:
+    return paginate(_query(db, models.ExamRegistration, fields), models.ExamRegistration, skip, limit, after).all()
 
 def create_exam_registration(db: Session, obj_in: schemas.ExamRegistrationCreate) -> models.ExamRegistration:
     db_obj = models.ExamRegistration(**obj_in.dict())
@@ -370,11 +457,11 @@ def delete_exam_registration(db: Session, id: UUID) -> Optional[models.ExamRegis
     return db_obj
 
 # ExamSession CRUD operations
-def get_exam_session(db: Session, id: UUID) -> Optional[models.ExamSession]:
-    return db.query(models.ExamSession).filter(models.ExamSession.id == id).first()
+def get_exam_session(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.ExamSession]:
+    return _query(db, models.ExamSession, fields).filter(models.ExamSession.id == id).first()
 
-def get_exam_sessions(db: Session, skip: int = 0, limit: int = 100) -> List[models.ExamSession]:
-    return db.query(models.ExamSession).offset(skip).limit(limit).all()
+def get_exam_sessions(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.ExamSession]:
+    return paginate(_query(db, models.ExamSession, fields), models.ExamSession, skip, limit, after).all()
 
 def create_exam_session(db: Session, obj_in: schemas.ExamSessionCreate) -> models.ExamSession:
     db_obj = models.ExamSession(**obj_in.dict())
@@ -399,12 +486,55 @@ def delete_exam_session(db: Session, id: UUID) -> Optional[models.ExamSession]:
         db.commit()
     return db_obj
 
+def _random_token():
+    # 64 hex characters (244 random bits) from two gen_random_uuid() calls, built in SQL
+    return func.replace(cast(func.gen_random_uuid(), String), "-", "").concat(
+        func.replace(cast(func.gen_random_uuid(), String), "-", "")
+    )
+
+def provision_exam_sessions(db: Session, exam_id: UUID) -> Optional[Tuple[int, int]]:
+    """
+    Create an ExamSession with a fresh session_token for every APPROVED
+    registration of the exam whose student has no session for it yet, in a
+    single INSERT ... SELECT. Re-running it only fills the gaps; the exam row
+    is locked so concurrent runs cannot provision a student twice.
+    Returns (approved, created), or None if the exam does not exist.
+    """
+    R, S = models.ExamRegistration, models.ExamSession
+    if db.scalar(select(models.Exam.id).where(models.Exam.id == exam_id).with_for_update()) is None:
+        return None
+    approved = and_(R.exam_id == exam_id, R.status == models.RegistrationStatus.APPROVED)
+    missing = select(
+        func.gen_random_uuid(),
+        R.exam_id,
+        R.student_id,
+        _random_token(),
+        cast(models.SessionStatus.ACTIVE, S.status.type),
+        cast({}, JSONB),
+        cast({}, JSONB),
+    ).where(
+        approved,
+        ~exists().where(S.exam_id == R.exam_id, S.student_id == R.student_id),
+    )
+    result = db.execute(
+        insert(S).from_select(
+            [S.id, S.exam_id, S.student_id, S.session_token, S.status, S.browser_info, S.extra_data], missing
+        )
+    )
+    total = db.scalar(select(func.count()).select_from(R).where(approved))
+    db.commit()
+    return total, result.rowcount
+
 # Submission CRUD operations
-def get_submission(db: Session, id: UUID) -> Optional[models.Submission]:
-    return db.query(models.Submission).filter(models.Submission.id == id).first()
+def get_submission(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.Submission]:
+    return _query(db, models.Submission, fields).filter(models.Submission.id == id).first()
 
-def get_submissions(db: Session, skip: int = 0, limit: int = 100) -> List[models.Submission]:
-    return db.query(models.Submission).offset(skip).limit(limit).all()
+def get_submissions(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None,
+    exam_session_id: Optional[UUID] = None, question_id: Optional[UUID] = None, student_id: Optional[UUID] = None, status: Optional[models.SubmissionStatus] = None,
+) -> List[models.Submission]:
+    query = _filter_by(_query(db, models.Submission, fields), models.Submission, exam_session_id=exam_session_id, question_id=question_id, student_id=student_id, status=status)
+    return paginate(query, models.Submission, skip, limit, after).all()
 
 def create_submission(db: Session, obj_in: schemas.SubmissionCreate) -> models.Submission:
     db_obj = models.Submission(**obj_in.dict())
@@ -430,11 +560,41 @@ def delete_submission(db: Session, id: UUID) -> Optional[models.Submission]:
     return db_obj
 
 # SubmissionResult CRUD operations
-def get_submission_result(db: Session, id: UUID) -> Optional[models.SubmissionResult]:
-    return db.query(models.SubmissionResult).filter(models.SubmissionResult.id == id).first()
-
-def get_submission_results(db: Session, skip: int = 0, limit: int = 100) -> List[models.SubmissionResult]:
-    return db.query(models.SubmissionResult).offset(skip).limit(limit).all()
+def get_submission_result(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.SubmissionResult]:
+    return _query(db, models.SubmissionResult, fields).filter(models.SubmissionResult.id == id).first()
+
+def get_submission_attempts(db: Session, exam_session_id: UUID, question_id: Optional[UUID] = None, limit: int = 100, after: Optional[AttemptCursor] = None, fields: Optional[List[str]] = None) -> List[models.Submission]:
+    """
+    A session's submissions in attempt order (per question), read off
+    idx_submissions_session_question_attempt_id; `after` seeks past a previous
+    page. id only breaks ties between repeated attempt numbers.
+    """
+    S = models.Submission
+    query = _filter_by(_query(db, S, _with_cursor_fields(fields, AttemptCursor)).filter(S.exam_session_id == exam_session_id), S, question_id=question_id)
+    if after is not None:
+        query = query.filter(
+            tuple_(S.question_id, S.attempt_number, S.id) > tuple_(after.question_id, after.attempt_number, after.id)
+        )
+    return query.order_by(S.question_id, S.attempt_number, S.id).limit(limit).all()
+
+def get_submission_results(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.SubmissionResult]:
+    return paginate(_query(db, models.SubmissionResult, fields), models.SubmissionResult, skip, limit, after).all()
+
+def get_results_for_submission(db: Session, submission_id: UUID, limit: int = 100, after: Optional[ResultCursor] = None, fields: Optional[List[str]] = None) -> List[models.SubmissionResult]:
+    """
+    A submission's results, newest first (backward scan of
+    idx_submission_results_submission_evaluated_at); `after` seeks past a
+    previous page.
+    """
+    R = models.SubmissionResult
+    query = _query(db, R, _with_cursor_fields(fields, ResultCursor)).filter(R.submission_id == submission_id)
+    if after is not None:
+        # As in paginate, the plain bound keeps the seek on the index
+        query = query.filter(
+            R.evaluated_at <= after.evaluated_at,
+            tuple_(R.evaluated_at, R.id) < tuple_(after.evaluated_at, after.id),
+        )
+    return query.order_by(R.evaluated_at.desc(), R.id.desc()).limit(limit).all()
 
 def create_submission_result(db: Session, obj_in: schemas.SubmissionResultCreate) -> models.SubmissionResult:
     db_obj = models.SubmissionResult(**obj_in.dict())
@@ -460,11 +620,11 @@ def delete_submission_result(db: Session, id: UUID) -> Optional[models.Submissio
     return db_obj
 
 # SubmissionEvent CRUD operations
-def get_submission_event(db: Session, id: UUID) -> Optional[models.SubmissionEvent]:
-    return db.query(models.SubmissionEvent).filter(models.SubmissionEvent.id == id).first()
+def get_submission_event(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.SubmissionEvent]:
+    return _query(db, models.SubmissionEvent, fields).filter(models.SubmissionEvent.id == id).first()
 
-def get_submission_events(db: Session, skip: int = 0, limit: int = 100) -> List[models.SubmissionEvent]:
-    return db.query(models.SubmissionEvent).offset(skip).limit(limit).all()
+def get_submission_events(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.SubmissionEvent]:
+    return paginate(_query(db, models.SubmissionEvent, fields), models.SubmissionEvent, skip, limit, after).all()
 
 def create_submission_event(db: Session, obj_in: schemas.SubmissionEventCreate) -> models.SubmissionEvent:
     db_obj = models.SubmissionEvent(**obj_in.dict())
@@ -490,11 +650,11 @@ def delete_submission_event(db: Session, id: UUID) -> Optional[models.Submission
     return db_obj
 
 # ExamEvent CRUD operations
-def get_exam_event(db: Session, id: UUID) -> Optional[models.ExamEvent]:
-    return db.query(models.ExamEvent).filter(models.ExamEvent.id == id).first()
+def get_exam_event(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.ExamEvent]:
+    return _query(db, models.ExamEvent, fields).filter(models.ExamEvent.id == id).first()
 
-def get_exam_events(db: Session, skip: int = 0, limit: int = 100) -> List[models.ExamEvent]:
-    return db.query(models.ExamEvent).offset(skip).limit(limit).all()
+def get_exam_events(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.ExamEvent]:
+    return paginate(_query(db, models.ExamEvent, fields), models.ExamEvent, skip, limit, after).all()
 
 def create_exam_event(db: Session, obj_in: schemas.ExamEventCreate) -> models.ExamEvent:
     db_obj = models.ExamEvent(**obj_in.dict())
@@ -520,21 +680,27 @@ def delete_exam_event(db: Session, id: UUID) -> Optional[models.ExamEvent]:
     return db_obj
 
 # AuditLog CRUD operations
-def get_audit_log(db: Session, id: UUID) -> Optional[models.AuditLog]:
-    return db.query(models.AuditLog).filter(models.AuditLog.id == id).first()
+def get_audit_log(db: Session, id: UUID, fields: Optional[List[str]] = None) -> Optional[models.AuditLog]:
+    return _query(db, models.AuditLog, fields).filter(models.AuditLog.id == id).first()
+
+def get_audit_logs(db: Session, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None, fields: Optional[List[str]] = None) -> List[models.AuditLog]:
+    return paginate(_query(db, models.AuditLog, fields), models.AuditLog, skip, limit, after).all()
 
-def get_audit_logs(db: Session, skip: int = 0, limit: int = 100) -> List[models.AuditLog]:
-    return db.query(models.AuditLog).offset(skip).limit(limit).all()
+def audit_log_values(data: dict) -> dict:
+    # psycopg2 cannot adapt ipaddress objects; INET takes their text form
+    if data.get("ip_address") is not None:
+        data["ip_address"] = str(data["ip_address"])
+    return data
 
 def create_audit_log(db: Session, obj_in: schemas.AuditLogCreate) -> models.AuditLog:
-    db_obj = models.AuditLog(**obj_in.dict())
+    db_obj = models.AuditLog(**audit_log_values(obj_in.dict()))
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
     return db_obj
 
 def update_audit_log(db: Session, db_obj: models.AuditLog, obj_in: schemas.AuditLogUpdate) -> models.AuditLog:
-    update_data = obj_in.dict(exclude_unset=True)
+    update_data = audit_log_values(obj_in.dict(exclude_unset=True))
     for field, value in update_data.items():
         setattr(db_obj, field, value)
     db.add(db_obj)
@@ -547,4 +713,199 @@ def delete_audit_log(db: Session, id: UUID) -> Optional[models.AuditLog]:
     if db_obj:
         db.delete(db_obj)
         db.commit()
-    return db_obj
\ No newline at end of file
+    return db_obj
+
+# Bulk event ingestion
+def event_rows(objs_in: list, parent_key: str, known: set) -> tuple:
+    """
+    Build insert rows (with client-side ids) for events whose parent is known.
+    Returns (rows, ids) where ids holds None for rejected items.
+    """
+    rows = []
+    ids: List[Optional[UUID]] = []
+    for obj_in in objs_in:
+        if getattr(obj_in, parent_key) not in known:
+            ids.append(None)
+            continue
+        row = obj_in.dict()
+        row["id"] = uuid4()
+        rows.append(row)
+        ids.append(row["id"])
+    return rows, ids
+
+# Exam paper bundle
+def get_exam_paper_version(db: Session, exam_id: UUID) -> Optional[str]:
+    """
+    Cheap fingerprint of everything in an exam paper: max(updated_at) and row
+    counts across the exam, its questions and their test cases. None if the
+    exam does not exist.
+    """
+    EQ, Q, TC = models.ExamQuestion, models.Question, models.QuestionTestCase
+    row = db.execute(
+        select(
+            models.Exam.updated_at,
+            select(func.max(EQ.updated_at)).where(EQ.exam_id == exam_id).scalar_subquery(),
+            select(func.count(EQ.id)).where(EQ.exam_id == exam_id).scalar_subquery(),
+            select(func.max(Q.updated_at)).join(EQ, EQ.question_id == Q.id).where(EQ.exam_id == exam_id).scalar_subquery(),
+            select(func.max(TC.updated_at)).join(EQ, EQ.question_id == TC.question_id).where(EQ.exam_id == exam_id).scalar_subquery(),
+            select(func.count(TC.id)).join(EQ, EQ.question_id == TC.question_id).where(EQ.exam_id == exam_id).scalar_subquery(),
+        ).where(models.Exam.id == exam_id)
+    ).first()
+    if row is None:
+        return None
+    return "|".join(str(value) for value in row)
+
+def get_exam_paper(db: Session, exam_id: UUID) -> Optional[tuple]:
+    """
+    Load an exam paper in three queries: the exam, its (ExamQuestion, Question)
+    pairs in question order, and the visible sample test cases per question.
+    """
+    exam = get_exam(db, exam_id)
+    if exam is None:
+        return None
+    pairs = db.execute(
+        select(models.ExamQuestion, models.Question)
+        .join(models.Question, models.ExamQuestion.question_id == models.Question.id)
+        .where(models.ExamQuestion.exam_id == exam_id)
+        .order_by(models.ExamQuestion.question_order)
+    ).all()
+    samples: dict = {question.id: [] for _, question in pairs}
+    if samples:
+        test_cases = db.scalars(
+            select(models.QuestionTestCase)
+            .where(
+                models.QuestionTestCase.question_id.in_(list(samples)),
+                models.QuestionTestCase.is_sample.is_(True),
+                models.QuestionTestCase.is_hidden.is_(False),
+            )
+            .order_by(models.QuestionTestCase.created_at, models.QuestionTestCase.id)
+        )
+        for test_case in test_cases:
+            samples[test_case.question_id].append(test_case)
+    return exam, pairs, samples
+
+# Exam result export
+def iter_exam_results(db: Session, exam_id: UUID, batch_size: int = 1000) -> Result:
+    """
+    Stream every submission of an exam with its results (one row per result,
+    or one row with empty result columns if not graded yet) through a
+    server-side cursor, so memory does not grow with the exam size.
+    """
+    S, R = models.Submission, models.SubmissionResult
+    submission_columns = [c for c in S.__table__.columns]
+    result_columns = [c.label(f"result_{c.name}") for c in R.__table__.columns if c.name != "submission_id"]
+    stmt = (
+        select(*submission_columns, *result_columns)
+        .join(models.ExamSession, S.exam_session_id == models.ExamSession.id)
+        .outerjoin(R, R.submission_id == S.id)
+        .where(models.ExamSession.exam_id == exam_id)
+        .order_by(S.submitted_at, S.id, R.evaluated_at)
+        .execution_options(yield_per=batch_size)
+    )
+    return db.execute(stmt)
+
+# Composite reads (fixed number of queries per graph)
+def get_exam_with_questions(db: Session, id: UUID) -> Optional[models.Exam]:
+    """
+    Exam, its questions in order and their visible sample test cases: 3 queries.
+    """
+    sample_tests = models.Question.test_cases.and_(
+        models.QuestionTestCase.is_sample.is_(True),
+        models.QuestionTestCase.is_hidden.is_(False),
+    )
+    return (
+        db.query(models.Exam)
+        .options(
+            selectinload(models.Exam.exam_questions)
+            .joinedload(models.ExamQuestion.question)
+            .selectinload(sample_tests)
+        )
+        .filter(models.Exam.id == id)
+        .first()
+    )
+
+def get_submission_with_details(db: Session, id: UUID) -> Optional[models.Submission]:
+    """
+    Submission with all its results and events: 3 queries.
+    """
+    return (
+        db.query(models.Submission)
+        .options(
+            selectinload(models.Submission.submission_results),
+            selectinload(models.Submission.submission_events),
+        )
+        .filter(models.Submission.id == id)
+        .first()
+    )
+
+# Submission context for result notifications
+def submission_context_query(ids: set):
+    S = models.Submission
+    return (
+        select(S.id, S.student_id, S.question_id, S.submitted_at, models.ExamSession.exam_id)
+        .join(models.ExamSession, models.ExamSession.id == S.exam_session_id)
+        .where(S.id.in_(ids))
+    )
+
+def get_submission_contexts(db: Session, ids: set) -> dict:
+    """
+    Map submission id -> (student_id, question_id, submitted_at, exam_id) in one query.
+    """
+    if not ids:
+        return {}
+    return {row.id: row for row in db.execute(submission_context_query(ids))}
+
+# Student dashboard
+def get_student_dashboard(db: Session, student_id: UUID) -> list:
+    """
+    One row per (exam, question) the student has graded results for: best
+    score across attempts, attempt and acceptance counts, exam points.
+    A single grouped query; results still RUNNING are not counted.
+    """
+    S, R, ES, EQ = models.Submission, models.SubmissionResult, models.ExamSession, models.ExamQuestion
+    stmt = (
+        select(
+            models.Exam.id.label("exam_id"),
+            models.Exam.title,
+            S.question_id,
+            func.max(R.score).label("best_score"),
+            func.max(R.max_score).label("max_score"),
+            func.max(EQ.points).label("points"),
+            func.count(distinct(S.id)).label("attempts"),
+            func.count(R.id).label("graded"),
+            func.count(R.id).filter(R.status == models.ExecutionStatus.ACCEPTED).label("accepted"),
+        )
+        .select_from(S)
+        .join(ES, ES.id == S.exam_session_id)
+        .join(models.Exam, models.Exam.id == ES.exam_id)
+        .join(R, R.submission_id == S.id)
+        .outerjoin(EQ, and_(EQ.exam_id == ES.exam_id, EQ.question_id == S.question_id))
+        .where(S.student_id == student_id, R.status != models.ExecutionStatus.RUNNING)
+        .group_by(models.Exam.id, models.Exam.title, S.question_id)
+        .order_by(models.Exam.start_time.desc(), models.Exam.id, func.min(EQ.question_order))
+    )
+    return db.execute(stmt).all()
+
+# Exam leaderboard
+def get_active_exam_ids(db: Session) -> List[UUID]:
+    return list(db.scalars(select(models.Exam.id).where(models.Exam.status == models.ExamStatus.ACTIVE)))
+
+def iter_leaderboard_submissions(db: Session, exam_id: UUID, batch_size: int = 1000) -> Iterator:
+    """
+    Every graded submission of an exam with its score and whether it was
+    accepted, streamed for rebuilding the leaderboard.
+    """
+    S, R = models.Submission, models.SubmissionResult
+    stmt = (
+        select(
+            S.id, S.student_id, S.question_id, S.submitted_at,
+            func.max(R.score).label("score"),
+            func.bool_or(R.status == models.ExecutionStatus.ACCEPTED).label("accepted"),
+        )
+        .join(models.ExamSession, models.ExamSession.id == S.exam_session_id)
+        .join(R, R.submission_id == S.id)
+        .where(models.ExamSession.exam_id == exam_id, R.status != models.ExecutionStatus.RUNNING)
+        .group_by(S.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(stmt)
\ No newline at end of file
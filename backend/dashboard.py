@@ -0,0 +1,105 @@
+"""
+Student dashboard aggregation for Online Exam System
+
+Per-exam totals, best score per question across attempts and pass rates,
+computed by one grouped query and cached per student. A committed
+SubmissionResult for a student evicts their dashboard in this worker and,
+through pubsub, in the others; DASHBOARD_CACHE_TTL only bounds staleness
+while that relay is down.
+"""
+
+import threading
+from itertools import groupby
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from . import crud, pubsub, result_events, schemas
+from .cache import TTLCache
+from .config import settings
+
+TOPIC = "dashboard_evictions"
+
+_dashboards = TTLCache(maxsize=settings.dashboard_cache_size)
+# Bumped on every eviction so a build that raced with one is not cached
+_generation = 0
+_generation_lock = threading.Lock()
+
+def _rate(accepted: int, graded: int) -> float:
+    return round(accepted / graded, 4) if graded else 0.0
+
+def build_dashboard(student_id: UUID, rows: list) -> schemas.StudentDashboard:
+    """
+    Fold the per-question rows of crud.get_student_dashboard into per-exam
+    and overall totals.
+    """
+    exams = []
+    for (exam_id, title), group in groupby(rows, key=lambda row: (row.exam_id, row.title)):
+        group = list(group)
+        graded = sum(row.graded for row in group)
+        accepted = sum(row.accepted for row in group)
+        exams.append(schemas.DashboardExam(
+            exam_id=exam_id,
+            title=title,
+            total_score=sum(row.best_score for row in group),
+            max_score=sum(row.max_score for row in group),
+            attempts=sum(row.attempts for row in group),
+            questions_attempted=len(group),
+            questions_passed=sum(1 for row in group if row.accepted),
+            pass_rate=_rate(accepted, graded),
+            questions=[
+                schemas.DashboardQuestion(
+                    question_id=row.question_id, best_score=row.best_score, max_score=row.max_score,
+                    points=row.points, attempts=row.attempts, accepted=row.accepted,
+                    pass_rate=_rate(row.accepted, row.graded),
+                )
+                for row in group
+            ],
+        ))
+    return schemas.StudentDashboard(
+        student_id=student_id,
+        total_score=sum(e.total_score for e in exams),
+        max_score=sum(e.max_score for e in exams),
+        attempts=sum(e.attempts for e in exams),
+        pass_rate=_rate(sum(row.accepted for row in rows), sum(row.graded for row in rows)),
+        exams=exams,
+    )
+
+def get_dashboard(db: Session, student_id: UUID) -> Optional[schemas.StudentDashboard]:
+    """
+    Cached dashboard for a student; None if the user does not exist.
+    """
+    dashboard = _dashboards.get(student_id)
+    if dashboard is not None:
+        return dashboard
+    generation = _generation
+    rows = crud.get_student_dashboard(db, student_id)
+    if not rows and crud.get_user(db, id=student_id, fields=["id"]) is None:
+        return None
+    dashboard = build_dashboard(student_id, rows)
+    with _generation_lock:
+        if generation == _generation:
+            _dashboards.set(student_id, dashboard, settings.dashboard_cache_ttl)
+    return dashboard
+
+def evict(student_id: UUID) -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        _dashboards.pop(student_id)
+
+def stats() -> dict:
+    return _dashboards.stats()
+
+@result_events.subscribe
+def _evict_on_results(events: List[result_events.ResultEvent]) -> None:
+    student_ids = {e.student_id for e in events}
+    for student_id in student_ids:
+        evict(student_id)
+    pubsub.publish(TOPIC, [str(student_id) for student_id in student_ids])
+
+@pubsub.subscribe(TOPIC)
+def _evict_relayed(student_ids: list) -> None:
+    for student_id in student_ids:
+        evict(UUID(student_id))
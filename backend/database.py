@@ -1,17 +1,68 @@
-from typing import Generator
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import itertools
+import time
+from typing import AsyncGenerator, Generator, List, Optional
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from backend.config import settings
+from backend.metrics import Histogram
 
 # SQLAlchemy 2.x style
 class Base(DeclarativeBase):
     pass
 
-# Engine with pool_pre_ping to avoid stale connections
+# --- Pool instrumentation ---
+class PoolStats:
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.timeouts = 0
+
+def _instrumented(pool_class, stats: PoolStats):
+    # Time every checkout, including the wait for a free connection
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.checkout_wait.observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    # Keep pool log records under SQLAlchemy's logger namespace
+    InstrumentedPool.__module__ = pool_class.__module__
+    return InstrumentedPool
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+_pool_options = dict(
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+)
+
+def _statement_timeout_args(is_async: bool) -> dict:
+    if not settings.db_statement_timeout_ms:
+        return {}
+    timeout = str(settings.db_statement_timeout_ms)
+    if is_async:
+        return {"server_settings": {"statement_timeout": timeout}}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+# Engine with pool_pre_ping to avoid stale connections; pool sized from Settings
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,
+    poolclass=_instrumented(QueuePool, sync_pool_stats),
+    connect_args=_statement_timeout_args(is_async=False),
     future=True,
+    **_pool_options,
 )
 
 # Session factory
@@ -23,9 +74,152 @@ SessionLocal = sessionmaker(
     future=True,
 )
 
-def get_db() -> Generator:
-    db = SessionLocal()
+# --- Read replicas ---
+# With DATABASE_REPLICA_URLS set, safe-method (GET/HEAD/OPTIONS) requests read
+# from a replica whose replication lag is within REPLICA_MAX_LAG_SECONDS, and
+# fall back to the primary when none is. A client whose request committed a
+# write gets a cookie pinning its reads to the primary for
+# READ_YOUR_WRITES_SECONDS; failed requests never get one.
+# Lag is measured by a background task (see replication), never by a request.
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Lag older than this many check intervals is not trusted
+_LAG_CHECKS_VALID = 3
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.pool_stats = PoolStats()
+        self.engine = create_engine(
+            url,
+            poolclass=_instrumented(QueuePool, self.pool_stats),
+            connect_args={**_statement_timeout_args(is_async=False), "connect_timeout": 2},
+            future=True,
+            **_pool_options,
+        )
+        self.session_factory = sessionmaker(
+            bind=self.engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True
+        )
+        # Unknown until the first lag check; unreachable replicas stay at inf
+        self.lag = float("inf")
+        self.checked_at = float("-inf")
+
+class ReadRouter:
+    """
+    Round-robin over replicas whose last lag check is recent and within the limit.
+    """
+
+    def __init__(self, replicas: List[Replica], max_lag: float, check_interval: float):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+
+    def usable(self, replica: Replica, now: float) -> bool:
+        fresh = now - replica.checked_at <= self.check_interval * _LAG_CHECKS_VALID
+        return fresh and replica.lag <= self.max_lag
+
+    def pick(self) -> Optional[Replica]:
+        now = time.monotonic()
+        usable = [r for r in self.replicas if self.usable(r, now)]
+        if not usable:
+            return None
+        return usable[next(self._turn) % len(usable)]
+
+replicas = [Replica(f"replica{i}", url) for i, url in enumerate(settings.database_replica_urls)]
+read_router = ReadRouter(replicas, settings.replica_max_lag_seconds, settings.replica_lag_check_interval) if replicas else None
+
+def _recent_write(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def _mark_write(request: Request, response: Response, session: Session) -> None:
+    # The cookie is set by the session's first commit (see _pin_to_primary)
+    if read_router is not None and request.method not in _SAFE_METHODS:
+        session.info["read_your_writes_response"] = response
+
+@event.listens_for(Session, "after_commit")
+def _pin_to_primary(session):
+    response = session.info.pop("read_your_writes_response", None)
+    if response is not None:
+        until = time.time() + settings.read_your_writes_seconds
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, f"{until:.3f}", max_age=int(settings.read_your_writes_seconds) + 1, httponly=True
+        )
+
+def session_factory_for(request: Request) -> sessionmaker:
+    """
+    The primary for writes, recent writers and lagging replicas; otherwise a replica.
+    """
+    if read_router is None or request.method not in _SAFE_METHODS or _recent_write(request):
+        return SessionLocal
+    replica = read_router.pick()
+    return replica.session_factory if replica is not None else SessionLocal
+
+def get_db(request: Request, response: Response) -> Generator:
+    db = session_factory_for(request)()
+    _mark_write(request, response, db)
     try:
         yield db
     finally:
         db.close()
+
+# Async engine (asyncpg) for hot paths that should run on the event loop
+async_engine = create_async_engine(
+    settings.async_database_url,
+    poolclass=_instrumented(AsyncAdaptedQueuePool, async_pool_stats),
+    connect_args=_statement_timeout_args(is_async=True),
+    **_pool_options,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+async def get_async_db(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    # Async routes always use the primary
+    async with AsyncSessionLocal() as db:
+        _mark_write(request, response, db.sync_session)
+        yield db
+
+def reset_after_fork() -> None:
+    """
+    Give a forked worker fresh, empty pools. close=False leaves the parent's
+    connections untouched instead of closing sockets it still owns.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    for replica in replicas:
+        replica.engine.dispose(close=False)
+
+def pool_status() -> dict:
+    """
+    Live pool usage and checkout wait statistics for every engine (primary and replicas).
+    """
+    status = {}
+    pools = [("sync", engine.pool, sync_pool_stats), ("async", async_engine.pool, async_pool_stats)]
+    pools += [(r.name, r.engine.pool, r.pool_stats) for r in replicas]
+    for name, pool, stats in pools:
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # QueuePool counts unopened base connections as negative overflow
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.db_max_overflow,
+            "timeouts": stats.timeouts,
+            "checkout_wait_seconds": stats.checkout_wait.snapshot(),
+        }
+    return status
+
+def replica_status() -> dict:
+    now = time.monotonic()
+    return {
+        r.name: {"lag_seconds": None if r.lag == float("inf") else r.lag, "usable": read_router.usable(r, now)}
+        for r in replicas
+    }
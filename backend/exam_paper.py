@@ -0,0 +1,122 @@
+"""
+Prebuilt, cached exam paper bundles for Online Exam System
+
+At exam start every student loads the same paper at once. The bundle is
+built once per worker, kept pre-serialized in an LRU cache keyed by exam id
+and tagged with a version fingerprint, and served with an ETag. Builds are
+serialized per exam, so a slow build never holds up another exam's paper.
+"""
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+from .cache import KeyedLock, LRUCache
+
+# How long a cached paper is served before its version is re-checked in the DB.
+# Writes in this worker invalidate immediately; this bounds cross-worker staleness.
+REVALIDATE_SECONDS = 5.0
+
+@dataclass
+class Paper:
+    version: str
+    body: bytes
+    etag: str
+    checked_at: float
+
+_papers = LRUCache(maxsize=256)
+_build_locks = KeyedLock()
+
+def _attrs(obj, schema) -> dict:
+    return {name: getattr(obj, name) for name in schema.__fields__ if hasattr(obj, name)}
+
+def _build(db: Session, exam_id: UUID, version: str) -> Optional[Paper]:
+    loaded = crud.get_exam_paper(db, exam_id)
+    if loaded is None:
+        return None
+    exam, pairs, samples = loaded
+    questions = []
+    for exam_question, question in pairs:
+        questions.append(schemas.ExamPaperQuestion(
+            **_attrs(question, schemas.ExamPaperQuestion),
+            question_id=question.id,
+            question_order=exam_question.question_order,
+            points=exam_question.points,
+            sample_test_cases=[schemas.ExamPaperTestCase(**_attrs(tc, schemas.ExamPaperTestCase)) for tc in samples[question.id]],
+        ))
+    paper = schemas.ExamPaper(version=version, exam=schemas.Exam(**_attrs(exam, schemas.Exam)), questions=questions)
+    body = json.dumps(jsonable_encoder(paper), separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return Paper(version=version, body=body, etag=etag, checked_at=time.monotonic())
+
+def get_paper(db: Session, exam_id: UUID) -> Optional[Paper]:
+    """
+    Return the cached paper for an exam, rebuilding it when its version moved.
+    Concurrent misses for the same exam wait on one build instead of each
+    querying the DB.
+    """
+    paper = _papers.get(exam_id)
+    if paper is not None and time.monotonic() - paper.checked_at < REVALIDATE_SECONDS:
+        return paper
+    with _build_locks.hold(exam_id):
+        paper = _papers.get(exam_id)
+        if paper is not None and time.monotonic() - paper.checked_at < REVALIDATE_SECONDS:
+            return paper
+        version = crud.get_exam_paper_version(db, exam_id)
+        if version is None:
+            _papers.pop(exam_id)
+            return None
+        if paper is not None and paper.version == version:
+            paper.checked_at = time.monotonic()
+            return paper
+        paper = _build(db, exam_id, version)
+        if paper is None:
+            _papers.pop(exam_id)
+        else:
+            _papers.set(exam_id, paper)
+        return paper
+
+def invalidate(exam_id: Optional[UUID] = None) -> None:
+    if exam_id is None:
+        _papers.clear()
+    else:
+        _papers.pop(exam_id)
+
+# --- Invalidation on writes ---
+# Collect touched exams at flush time and drop their papers once the
+# transaction commits. Question and test case edits can affect any exam.
+_ALL = object()
+
+@event.listens_for(Session, "after_flush")
+def _collect_paper_writes(session, flush_context):
+    touched = session.info.setdefault("exam_paper_touched", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.Exam):
+            touched.add(obj.id)
+        elif isinstance(obj, models.ExamQuestion):
+            touched.add(obj.exam_id)
+        elif isinstance(obj, (models.Question, models.QuestionTestCase)):
+            touched.add(_ALL)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_paper_writes(session):
+    touched = session.info.pop("exam_paper_touched", None)
+    if not touched:
+        return
+    if _ALL in touched:
+        invalidate()
+    else:
+        for exam_id in touched:
+            invalidate(exam_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_paper_writes(session):
+    session.info.pop("exam_paper_touched", None)
@@ -0,0 +1,65 @@
+"""
+Streaming exports for Online Exam System
+"""
+
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+
+from . import crud
+from .database import SessionLocal
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Rows buffered per chunk written to the response
+CHUNK_ROWS = 500
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def stream_exam_results(exam_id: UUID, fmt: str) -> Iterator[bytes]:
+    """
+    Yield an exam's submissions and results as NDJSON or CSV chunks.
+    Uses its own session so the server-side cursor lives as long as the
+    response body is being sent.
+    """
+    db = SessionLocal()
+    try:
+        buf = io.StringIO()
+        result = crud.iter_exam_results(db, exam_id)
+        if fmt == "csv":
+            # Header from the query itself, so an exam without results still gets one
+            writer = csv.writer(buf)
+            writer.writerow(result.keys())
+        pending = 0
+        for row in result:
+            data = row._mapping
+            if fmt == "csv":
+                writer.writerow([_csv_value(v) for v in data.values()])
+            else:
+                buf.write(json.dumps(jsonable_encoder(dict(data)), separators=(",", ":")))
+                buf.write("\n")
+            pending += 1
+            if pending >= CHUNK_ROWS:
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
+                pending = 0
+        if buf.tell():
+            yield buf.getvalue().encode()
+    finally:
+        db.close()
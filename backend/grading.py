@@ -0,0 +1,429 @@
+"""
+Judge0 grading dispatcher for Online Exam System
+
+Picks up PENDING submissions, runs each against its question's test cases
+through Judge0's batch API, polls outstanding tokens in batches and writes
+the graded SubmissionResult rows back in bulk.
+"""
+
+import asyncio
+import base64
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from . import async_crud, grading_cache, models, result_events, submission_updates
+from .config import settings
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Judge0 language ids for the names stored in Submission.language
+LANGUAGE_IDS = {
+    "c": 50,
+    "cpp": 54,
+    "c++": 54,
+    "csharp": 51,
+    "go": 60,
+    "java": 62,
+    "javascript": 63,
+    "js": 63,
+    "kotlin": 78,
+    "python": 71,
+    "python3": 71,
+    "ruby": 72,
+    "rust": 73,
+    "typescript": 74,
+}
+
+# Judge0 status ids
+_IN_QUEUE, _PROCESSING, _ACCEPTED = 1, 2, 3
+_STATUS_MAP = {
+    3: models.ExecutionStatus.ACCEPTED,
+    4: models.ExecutionStatus.WRONG_ANSWER,
+    5: models.ExecutionStatus.TIME_LIMIT_EXCEEDED,
+    6: models.ExecutionStatus.COMPILATION_ERROR,
+    13: models.ExecutionStatus.INTERNAL_ERROR,
+    14: models.ExecutionStatus.INTERNAL_ERROR,
+}
+
+_POLL_FIELDS = "token,status_id,stdout,stderr,compile_output,exit_code,time,memory"
+
+
+def language_id(language: str) -> Optional[int]:
+    name = language.strip().lower()
+    if name.isdigit():
+        return int(name)
+    return LANGUAGE_IDS.get(name)
+
+
+def execution_status(status_id: int) -> models.ExecutionStatus:
+    # 7-12 are the runtime error variants (SIGSEGV, SIGFPE, NZEC, ...)
+    return _STATUS_MAP.get(status_id, models.ExecutionStatus.RUNTIME_ERROR)
+
+
+def cpu_time_limit(question: models.Question) -> float:
+    # Judge0 rejects items above its max_cpu_time_limit (15 s by default)
+    limit = settings.judge0_max_cpu_time_limit
+    return min(question.time_limit_seconds or limit, limit)
+
+
+def _b64(text: Optional[str]) -> Optional[str]:
+    return None if text is None else base64.b64encode(text.encode()).decode()
+
+
+def _unb64(text: Optional[str]) -> Optional[str]:
+    return None if text is None else base64.b64decode(text).decode(errors="replace")
+
+
+class Judge0Client:
+    """
+    Minimal Judge0 batch API client. `concurrency` bounds in-flight requests.
+    """
+
+    def __init__(self, base_url: str, auth_token: str = "", concurrency: int = 4, timeout: float = 30.0):
+        headers = {"X-Auth-Token": auth_token} if auth_token else {}
+        self._http = httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout)
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def submit_batch(self, submissions: List[dict]) -> List[dict]:
+        async with self._slots:
+            response = await self._http.post(
+                "/submissions/batch", params={"base64_encoded": "true"}, json={"submissions": submissions}
+            )
+        response.raise_for_status()
+        return response.json()
+
+    async def get_batch(self, tokens: List[str]) -> List[dict]:
+        async with self._slots:
+            response = await self._http.get(
+                "/submissions/batch",
+                params={"tokens": ",".join(tokens), "base64_encoded": "true", "fields": _POLL_FIELDS},
+            )
+        response.raise_for_status()
+        return response.json()["submissions"]
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class GradingDispatcher:
+    """
+    Drives submissions PENDING -> RUNNING -> COMPLETED/ERROR.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so several workers can run
+    a dispatcher against the same database. Each claim is committed before
+    the judge is called and the outcome is written back in a new
+    transaction, so no row lock or pooled connection is held across a
+    Judge0 round trip.
+    """
+
+    def __init__(self, client: Judge0Client, batch_size: int = 20, poll_interval: float = 1.0,
+                 timeout: float = 300.0, session_factory=AsyncSessionLocal):
+        self.client = client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session_factory = session_factory
+
+    async def run(self) -> None:
+        while True:
+            try:
+                dispatched = await self.dispatch_once()
+                completed = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Grading cycle failed")
+                dispatched = completed = 0
+            # Only a full claim suggests more PENDING work is waiting right now
+            if not completed and dispatched < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def dispatch_once(self) -> int:
+        """
+        Send one claim's worth of submissions to the judge and record their
+        tokens. Returns the number of submissions claimed.
+        """
+        async with self.session_factory() as db:
+            submissions = await async_crud.claim_pending_submissions(db, self.batch_size, self.timeout)
+            if not submissions:
+                await db.rollback()
+                return 0
+            question_ids = {s.question_id for s in submissions}
+            questions = await async_crud.get_questions_by_ids(db, question_ids)
+            test_cases = await async_crud.get_test_cases_by_question(db, question_ids)
+            fingerprints = {
+                question_id: grading_cache.test_set_fingerprint(questions[question_id], test_cases[question_id])
+                for question_id in question_ids
+            }
+            keys = {
+                s.id: grading_cache.grading_key(s.language, s.source_code, fingerprints[s.question_id])
+                for s in submissions if language_id(s.language) is not None
+            }
+            # Identical code graded by another worker or before a restart is only in the table
+            graded = await async_crud.get_graded_results(
+                db, grading_cache.missing(keys.values()), grading_cache.CACHEABLE_STATUSES, grading_cache.RESULT_FIELDS
+            )
+            await db.commit()
+        for key, values in graded.items():
+            grading_cache.store(key, values)
+
+        payloads, owners, unsupported, cached = [], [], set(), {}
+        for submission in submissions:
+            lang = language_id(submission.language)
+            if lang is None:
+                unsupported.add(submission.id)
+                continue
+            question = questions[submission.question_id]
+            hit = grading_cache.lookup(keys[submission.id], question.max_score)
+            if hit is not None:
+                cached[submission.id] = hit
+                continue
+            # A question without test cases is run once with empty input
+            for test_case in test_cases[submission.question_id] or [None]:
+                payloads.append({
+                    "language_id": lang,
+                    "source_code": _b64(submission.source_code),
+                    "stdin": _b64(test_case.input_data if test_case else ""),
+                    "expected_output": _b64(test_case.expected_output) if test_case else None,
+                    "cpu_time_limit": cpu_time_limit(question),
+                })
+                owners.append((submission, test_case))
+
+        ids = [s.id for s in submissions]
+        try:
+            responses = await asyncio.gather(
+                *(self.client.submit_batch(chunk) for chunk in _chunks(payloads, self.batch_size))
+            )
+        except httpx.HTTPError:
+            # Hand the submissions back as PENDING for the next cycle
+            await self._release(ids)
+            raise
+
+        cases: Dict = {s.id: [] for s in submissions}
+        unpaired = set()
+        for chunk, items in zip(_chunks(owners, self.batch_size), responses):
+            if len(items) != len(chunk):
+                # Tokens cannot be matched to test cases; grade these submissions again later
+                logger.warning("Judge returned %d tokens for %d submissions", len(items), len(chunk))
+                unpaired.update(submission.id for submission, _ in chunk)
+                continue
+            for (submission, test_case), item in zip(chunk, items):
+                cases[submission.id].append({
+                    "test_case_id": str(test_case.id) if test_case else None,
+                    "weight": test_case.weight if test_case else 1,
+                    "token": item.get("token") if isinstance(item, dict) else None,
+                })
+
+        rows, statuses = [], {}
+        for submission in submissions:
+            question = questions[submission.question_id]
+            row = {"submission_id": submission.id, "max_score": question.max_score, "score": 0}
+            if submission.id in unpaired:
+                # Handed back as PENDING without a result row
+                statuses[submission.id] = models.SubmissionStatus.PENDING
+                continue
+            if submission.id in unsupported:
+                row.update(status=models.ExecutionStatus.COMPILATION_ERROR, stderr=f"Unsupported language: {submission.language}")
+                statuses[submission.id] = models.SubmissionStatus.ERROR
+            elif submission.id in cached:
+                # Identical code already graded against the same test set
+                row.update(cached[submission.id], grading_key=keys[submission.id], extra_data={"cached": True})
+                statuses[submission.id] = models.SubmissionStatus.COMPLETED
+            elif any(case["token"] is None for case in cases[submission.id]):
+                row.update(status=models.ExecutionStatus.INTERNAL_ERROR, stderr="Judge rejected the submission")
+                statuses[submission.id] = models.SubmissionStatus.ERROR
+            else:
+                row.update(
+                    status=models.ExecutionStatus.RUNNING,
+                    test_results={"cases": cases[submission.id]},
+                    grading_key=keys[submission.id],
+                )
+            rows.append(row)
+
+        async with self.session_factory() as db:
+            # A submission re-claimed by another worker meanwhile is left to it
+            owned = await async_crud.lock_unresulted_submissions(db, ids)
+            rows = [row for row in rows if row["submission_id"] in owned]
+            statuses = {id: status for id, status in statuses.items() if id in owned}
+            await async_crud.create_submission_results_bulk(db, rows)
+            await self._set_statuses(db, statuses)
+            finished = [row for row in rows if row["status"] != models.ExecutionStatus.RUNNING]
+            contexts = await async_crud.get_submission_contexts(db, set(statuses))
+            await db.commit()
+        self._announce(statuses, finished, contexts)
+        return len(submissions)
+
+    async def poll_once(self) -> int:
+        """
+        Fetch judge verdicts for outstanding results in batches and write back
+        the finished ones. Results whose tokens the judge no longer knows, or
+        that are still unfinished `timeout` seconds after dispatch, fail as
+        INTERNAL_ERROR. Returns the number of results written.
+        """
+        async with self.session_factory() as db:
+            results = await async_crud.claim_running_results(db, self.batch_size, self.poll_interval)
+            await db.commit()
+        if not results:
+            return 0
+        tokens = [case["token"] for r in results for case in r.test_results["cases"] if case["token"]]
+        responses = await asyncio.gather(
+            *(self.client.get_batch(chunk) for chunk in _chunks(tokens, self.batch_size))
+        )
+        verdicts = {item["token"]: item for chunk in responses for item in chunk if item}
+
+        deadline = datetime.now(timezone.utc) - timedelta(seconds=self.timeout)
+        outcomes = []
+        for result in results:
+            cases = result.test_results["cases"]
+            checks = [verdicts.get(case["token"]) for case in cases]
+            if any(v is None for v in checks):
+                # Lost by the judge (e.g. restarted with a fresh database)
+                graded = self._fail(result, "Judge no longer knows this submission")
+            elif any(v.get("status_id") in (_IN_QUEUE, _PROCESSING) for v in checks):
+                if result.created_at > deadline:
+                    continue
+                graded = self._fail(result, f"No verdict from the judge within {self.timeout:g}s")
+            else:
+                graded = self._grade(result, cases, checks)
+                if result.grading_key:
+                    grading_cache.store(result.grading_key, graded)
+            outcomes.append((result, graded))
+        if not outcomes:
+            return 0
+
+        async with self.session_factory() as db:
+            owned = await async_crud.lock_running_results(db, [result.id for result, _ in outcomes])
+            outcomes = [(result, graded) for result, graded in outcomes if result.id in owned]
+            statuses = {
+                result.submission_id: (
+                    models.SubmissionStatus.ERROR if graded.get("failed") else models.SubmissionStatus.COMPLETED
+                )
+                for result, graded in outcomes
+            }
+            updates = [{k: v for k, v in graded.items() if k != "failed"} for _, graded in outcomes]
+            await async_crud.update_submission_results_bulk(db, updates)
+            await self._set_statuses(db, statuses)
+            contexts = await async_crud.get_submission_contexts(db, set(statuses))
+            await db.commit()
+        finished = [
+            {**update, "submission_id": result.submission_id, "max_score": result.max_score}
+            for (result, _), update in zip(outcomes, updates)
+        ]
+        self._announce(statuses, finished, contexts)
+        return len(updates)
+
+    async def _release(self, ids: List) -> None:
+        async with self.session_factory() as db:
+            owned = await async_crud.lock_unresulted_submissions(db, ids)
+            statuses = {id: models.SubmissionStatus.PENDING for id in owned}
+            await self._set_statuses(db, statuses)
+            contexts = await async_crud.get_submission_contexts(db, owned)
+            await db.commit()
+        self._announce(statuses, [], contexts)
+
+    @staticmethod
+    async def _set_statuses(db, statuses: Dict) -> None:
+        for status in set(statuses.values()):
+            await async_crud.set_submissions_status(db, [id for id, s in statuses.items() if s == status], status)
+
+    @staticmethod
+    def _announce(statuses: Dict, finished: List[dict], contexts: dict) -> None:
+        # Bulk writes skip ORM events; publish status changes and final results ourselves
+        submission_updates.publish([
+            submission_updates.status_update(id, contexts[id].student_id, status)
+            for id, status in statuses.items() if id in contexts
+        ])
+        result_events.publish(result_events.build_events(finished, contexts))
+
+    @staticmethod
+    def _fail(result: models.SubmissionResult, reason: str) -> dict:
+        # Same keys as _grade, so both kinds of rows share one executemany UPDATE
+        return {
+            "id": result.id,
+            "status": models.ExecutionStatus.INTERNAL_ERROR,
+            "stdout": None,
+            "stderr": reason,
+            "compile_output": None,
+            "exit_code": None,
+            "execution_time": None,
+            "memory_used": None,
+            "score": 0,
+            "test_results": {**result.test_results, "error": reason},
+            "failed": True,
+        }
+
+    @staticmethod
+    def _grade(result: models.SubmissionResult, cases: List[dict], verdicts: List[dict]) -> dict:
+        total_weight = sum(case["weight"] for case in cases) or 1
+        passed_weight = 0
+        status = models.ExecutionStatus.ACCEPTED
+        graded = []
+        for case, verdict in zip(cases, verdicts):
+            case_status = execution_status(verdict["status_id"])
+            if case_status == models.ExecutionStatus.ACCEPTED:
+                passed_weight += case["weight"]
+            elif status == models.ExecutionStatus.ACCEPTED:
+                status = case_status
+            graded.append({
+                **case,
+                "status": case_status.value,
+                "time": float(verdict["time"]) if verdict.get("time") else None,
+                "memory": verdict.get("memory"),
+            })
+        # Report the output of the first failing case (or the last case if all passed)
+        shown = next((v for v in verdicts if v["status_id"] != _ACCEPTED), verdicts[-1])
+        times = [c["time"] for c in graded if c["time"] is not None]
+        memories = [c["memory"] for c in graded if c["memory"] is not None]
+        return {
+            "id": result.id,
+            "status": status,
+            "stdout": _unb64(shown.get("stdout")),
+            "stderr": _unb64(shown.get("stderr")),
+            "compile_output": _unb64(shown.get("compile_output")),
+            "exit_code": shown.get("exit_code"),
+            "execution_time": max(times) if times else None,
+            "memory_used": max(memories) if memories else None,
+            "score": result.max_score * passed_weight // total_weight,
+            "test_results": {"cases": graded, "passed_weight": passed_weight, "total_weight": total_weight},
+        }
+
+
+_task: Optional[asyncio.Task] = None
+_client: Optional[Judge0Client] = None
+
+
+def start() -> None:
+    """
+    Start the dispatcher on the running event loop if JUDGE0_URL is set.
+    """
+    global _task, _client
+    if not settings.judge0_url or _task is not None:
+        return
+    _client = Judge0Client(settings.judge0_url, settings.judge0_auth_token, settings.grading_concurrency)
+    dispatcher = GradingDispatcher(
+        _client, settings.grading_batch_size, settings.grading_poll_interval, settings.grading_timeout
+    )
+    _task = asyncio.get_running_loop().create_task(dispatcher.run())
+
+
+async def stop() -> None:
+    global _task, _client
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,71 @@
+"""
+Content-addressed grading result cache for Online Exam System
+
+Byte-identical resubmissions of the same question are graded once. Entries
+are keyed by hash(language, source_code, test-set fingerprint); editing,
+adding, removing or reweighting a test case changes the fingerprint, so
+stale entries are never matched again and simply age out of the LRU.
+The key is also stored in submission_results.grading_key, so a key this
+worker has not seen is looked up in the table before running the code.
+"""
+
+import hashlib
+from typing import Iterable, Optional, Set
+
+from . import models
+from .cache import LRUCache
+from .config import settings
+
+# Outcomes that depend only on the code and the tests. Time limits and judge
+# failures can change between runs and are always re-executed.
+CACHEABLE_STATUSES = {
+    models.ExecutionStatus.ACCEPTED,
+    models.ExecutionStatus.WRONG_ANSWER,
+    models.ExecutionStatus.COMPILATION_ERROR,
+    models.ExecutionStatus.RUNTIME_ERROR,
+}
+
+# Result fields copied from a cached grading (score is rescaled to max_score)
+RESULT_FIELDS = ("status", "stdout", "stderr", "compile_output", "exit_code", "execution_time", "memory_used", "test_results")
+
+_results = LRUCache(maxsize=settings.grading_cache_size)
+
+def test_set_fingerprint(question: models.Question, test_cases: Iterable[models.QuestionTestCase]) -> str:
+    h = hashlib.sha256(f"{question.id}|{question.time_limit_seconds}".encode())
+    for tc in sorted(test_cases, key=lambda tc: str(tc.id)):
+        h.update(f"|{tc.id}|{tc.weight}|{tc.updated_at.isoformat() if tc.updated_at else ''}|".encode())
+        h.update(tc.input_data.encode())
+        h.update(b"\0")
+        h.update(tc.expected_output.encode())
+    return h.hexdigest()
+
+def grading_key(language: str, source_code: str, fingerprint: str) -> str:
+    h = hashlib.sha256(language.strip().lower().encode())
+    h.update(b"\0")
+    h.update(source_code.encode())
+    h.update(b"\0")
+    h.update(fingerprint.encode())
+    return h.hexdigest()
+
+def missing(keys: Iterable[str]) -> Set[str]:
+    """
+    Keys not in the in-process cache (without counting hits or misses).
+    """
+    return {key for key in keys if key not in _results}
+
+def lookup(key: str, max_score: int) -> Optional[dict]:
+    """
+    Result column values for a previously graded identical submission.
+    """
+    cached = _results.get(key)
+    if cached is None:
+        return None
+    total = cached["test_results"].get("total_weight") or 1
+    return {**cached, "score": max_score * cached["test_results"].get("passed_weight", 0) // total}
+
+def store(key: str, graded: dict) -> None:
+    if graded["status"] in CACHEABLE_STATUSES:
+        _results.set(key, {field: graded[field] for field in RESULT_FIELDS})
+
+def stats() -> dict:
+    return _results.stats()
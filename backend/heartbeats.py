@@ -0,0 +1,141 @@
+"""
+Exam session heartbeat aggregation for Online Exam System
+
+Heartbeats only update an in-memory map of the latest timestamp per exam
+session. Every HEARTBEAT_FLUSH_INTERVAL seconds the sessions that beat
+since the last flush are written with one set-based UPDATE.
+
+Idle detection reads last_activity_at of the exam's ACTIVE sessions, so
+it sees the heartbeats of every worker, and merges in this worker's beats
+that are not written yet. Beats another worker has not flushed are missed
+for at most one flush interval, so HEARTBEAT_IDLE_SECONDS should be well
+above HEARTBEAT_FLUSH_INTERVAL.
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import async_crud, schemas
+from .config import settings
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Rows per UPDATE statement (2 bind parameters each; asyncpg allows 32767)
+_FLUSH_CHUNK = 5000
+
+# Beats not written yet, and those of a flush that has not committed
+_dirty: Dict[UUID, datetime] = {}
+_flushing: Dict[UUID, datetime] = {}
+_lock = threading.Lock()
+
+
+def beat(session: schemas.ValidatedSession, now: Optional[datetime] = None) -> datetime:
+    """
+    Record a heartbeat for a validated exam session. O(1), no I/O.
+    """
+    now = now or datetime.now(timezone.utc)
+    with _lock:
+        if session.id not in _dirty or now > _dirty[session.id]:
+            _dirty[session.id] = now
+    return now
+
+
+def _unflushed(session_id: UUID) -> Optional[datetime]:
+    seen = [t for t in (_dirty.get(session_id), _flushing.get(session_id)) if t is not None]
+    return max(seen) if seen else None
+
+
+async def idle_sessions(db: AsyncSession, exam_id: UUID, idle_seconds: float,
+                        now: Optional[datetime] = None) -> List[schemas.IdleSession]:
+    """
+    ACTIVE sessions of an exam whose latest heartbeat is older than `idle_seconds`.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=idle_seconds)
+    rows = await async_crud.get_idle_exam_sessions(db, exam_id, cutoff)
+    idle = []
+    with _lock:
+        for row in rows:
+            seen = max(row.last_activity_at, _unflushed(row.id) or row.last_activity_at)
+            if seen < cutoff:
+                idle.append((row, seen))
+    return [
+        schemas.IdleSession(
+            session_id=row.id,
+            student_id=row.student_id,
+            last_activity_at=seen,
+            idle_seconds=round((now - seen).total_seconds(), 3),
+        )
+        for row, seen in sorted(idle, key=lambda item: item[1])
+    ]
+
+
+async def flush() -> int:
+    """
+    Write pending heartbeats. Returns the number of sessions written.
+    """
+    global _flushing
+    with _lock:
+        pending = dict(_dirty)
+        _dirty.clear()
+        _flushing = pending
+    try:
+        async with AsyncSessionLocal() as db:
+            items = list(pending.items())
+            for start in range(0, len(items), _FLUSH_CHUNK):
+                await async_crud.touch_exam_sessions(db, dict(items[start:start + _FLUSH_CHUNK]))
+            await db.commit()
+    except Exception:
+        # Put the heartbeats back unless newer ones arrived meanwhile
+        with _lock:
+            for session_id, seen in pending.items():
+                if session_id not in _dirty or seen > _dirty[session_id]:
+                    _dirty[session_id] = seen
+        raise
+    finally:
+        with _lock:
+            _flushing = {}
+    return len(pending)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(settings.heartbeat_flush_interval)
+        try:
+            await flush()
+        except Exception:
+            logger.exception("Heartbeat flush failed")
+
+
+def start() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    """
+    Stop the flush loop and write whatever is still pending.
+    """
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    try:
+        await flush()
+    except Exception:
+        logger.exception("Final heartbeat flush failed")
@@ -0,0 +1,243 @@
+"""
+Live exam leaderboards for Online Exam System
+
+Each worker keeps per-exam standings in memory, ordered by (score desc,
+penalty asc) in a sorted list, so applying a graded result and answering a
+top-K or rank-of-student query are O(log n) in the number of students.
+Boards of active exams are built at startup, others on first request, and
+then kept up to date without touching the DB: committed results are
+applied as they land (see result_events) and relayed through pubsub to the
+boards of the other workers. Boards are dropped only when the relay
+reconnects after an outage, since results relayed meanwhile were missed.
+The ETag is a digest of the standings, so it is the same in every worker
+holding the same board.
+
+Scoring: a student's score is the sum of their best score per question.
+For every question scored on, the penalty adds the minutes from exam start
+to the first submission reaching that best score, plus
+LEADERBOARD_PENALTY_MINUTES for each earlier attempt on the question.
+"""
+
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from uuid import UUID
+
+from sortedcontainers import SortedList
+from sqlalchemy.orm import Session
+
+from . import crud, models, pubsub, result_events, schemas
+from .cache import KeyedLock, LRUCache
+from .config import settings
+
+
+TOPIC = "leaderboard_results"
+
+
+class Attempt(NamedTuple):
+    score: int
+    accepted: bool
+    submitted_at: datetime
+
+
+class Standing(NamedTuple):
+    score: int
+    penalty: int
+    solved: int
+
+
+def _sort_key(standing: Standing) -> tuple:
+    return (-standing.score, standing.penalty)
+
+
+class Board:
+    def __init__(self, exam_id: UUID, start_time: datetime):
+        self.exam_id = exam_id
+        self.start_time = start_time
+        self.version = 0
+        self._etag = None
+        self._etag_version = None
+        self._attempts: Dict[UUID, Dict[UUID, Dict[UUID, Attempt]]] = {}
+        self._standings: Dict[UUID, Standing] = {}
+        self._ranking = SortedList()
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        """
+        Digest of the ordered standings, recomputed at most once per version.
+        """
+        with self._lock:
+            if self._etag_version != self.version:
+                digest = hashlib.sha256(str(self.exam_id).encode())
+                for _, _, student_id in self._ranking:
+                    digest.update(f"|{student_id}:{':'.join(map(str, self._standings[student_id]))}".encode())
+                self._etag = f'W/"{digest.hexdigest()[:16]}"'
+                self._etag_version = self.version
+            return self._etag
+
+    def __len__(self) -> int:
+        return len(self._standings)
+
+    def apply(self, student_id: UUID, question_id: UUID, submission_id: UUID, attempt: Attempt) -> None:
+        """
+        Record (or replace) the graded attempt of one submission and move the
+        student to their new position.
+        """
+        with self._lock:
+            questions = self._attempts.setdefault(student_id, {})
+            attempts = questions.setdefault(question_id, {})
+            if attempts.get(submission_id) == attempt:
+                return
+            attempts[submission_id] = attempt
+            standing = self._standing(questions)
+            previous = self._standings.get(student_id)
+            if standing == previous:
+                return
+            if previous is not None:
+                self._ranking.remove((*_sort_key(previous), student_id))
+            self._ranking.add((*_sort_key(standing), student_id))
+            self._standings[student_id] = standing
+            self.version += 1
+
+
+    def _standing(self, questions: Dict[UUID, Dict[UUID, Attempt]]) -> Standing:
+        # Bounded by the student's own attempts, not by the board size
+        score = penalty = solved = 0
+        for attempts in questions.values():
+            best = max(a.score for a in attempts.values())
+            solved += any(a.accepted for a in attempts.values())
+            if best <= 0:
+                continue
+            reached_at = min(a.submitted_at for a in attempts.values() if a.score == best)
+            earlier = sum(1 for a in attempts.values() if a.submitted_at < reached_at)
+            elapsed = max(0, int((reached_at - self.start_time).total_seconds() // 60))
+            score += best
+            penalty += elapsed + settings.leaderboard_penalty_minutes * earlier
+        return Standing(score, penalty, solved)
+
+    def _entry(self, rank: int, student_id: UUID, standing: Standing) -> schemas.LeaderboardEntry:
+        return schemas.LeaderboardEntry(rank=rank, student_id=student_id, **standing._asdict())
+
+    def top(self, k: int) -> List[schemas.LeaderboardEntry]:
+        """
+        The first `k` standings. Tied students share the better rank.
+        """
+        entries = []
+        with self._lock:
+            previous = None
+            for position, (neg_score, penalty, student_id) in enumerate(self._ranking.islice(0, k), start=1):
+                rank = entries[-1].rank if (neg_score, penalty) == previous else position
+                entries.append(self._entry(rank, student_id, self._standings[student_id]))
+                previous = (neg_score, penalty)
+        return entries
+
+    def rank_of(self, student_id: UUID) -> Optional[schemas.LeaderboardEntry]:
+        with self._lock:
+            standing = self._standings.get(student_id)
+            if standing is None:
+                return None
+            return self._entry(self._ranking.bisect_left(_sort_key(standing)) + 1, student_id, standing)
+
+
+class Result(NamedTuple):
+    exam_id: UUID
+    student_id: UUID
+    question_id: UUID
+    submission_id: UUID
+    attempt: Attempt
+
+
+_boards = LRUCache(maxsize=256)
+_build_locks = KeyedLock()
+# Results committed while a board is being built, replayed onto it afterwards
+_pending: Dict[UUID, List[Result]] = {}
+_pending_lock = threading.Lock()
+
+def build(db: Session, exam_id: UUID) -> Optional[Board]:
+    """
+    Rebuild an exam's board from the DB and install it; None if the exam does not exist.
+    """
+    with _pending_lock:
+        _pending[exam_id] = []
+    board = None
+    try:
+        exam = crud.get_exam(db, id=exam_id, fields=["id", "start_time"])
+        if exam is not None:
+            board = Board(exam_id, exam.start_time)
+            for row in crud.iter_leaderboard_submissions(db, exam_id):
+                board.apply(row.student_id, row.question_id, row.id, Attempt(row.score, row.accepted, row.submitted_at))
+    except Exception:
+        with _pending_lock:
+            _pending.pop(exam_id, None)
+        raise
+    with _pending_lock:
+        pending = _pending.pop(exam_id)
+        if board is None:
+            _boards.pop(exam_id)
+        else:
+            # Replays are idempotent, so results the query already saw are harmless
+            for result in pending:
+                board.apply(result.student_id, result.question_id, result.submission_id, result.attempt)
+            _boards.set(exam_id, board)
+    return board
+
+def get_board(db: Session, exam_id: UUID) -> Optional[Board]:
+    """
+    The exam's board, built on first use.
+    """
+    board = _boards.get(exam_id)
+    if board is not None:
+        return board
+    with _build_locks.hold(exam_id):
+        board = _boards.get(exam_id)
+        if board is not None:
+            return board
+        return build(db, exam_id)
+
+def warm(db: Session) -> int:
+    """
+    Build the boards of all ACTIVE exams, locking one exam at a time so
+    requests for the others are not held up. Returns the number built.
+    """
+    exam_ids = crud.get_active_exam_ids(db)
+    for exam_id in exam_ids:
+        with _build_locks.hold(exam_id):
+            build(db, exam_id)
+    return len(exam_ids)
+
+def _apply(results: List[Result]) -> None:
+    with _pending_lock:
+        for result in results:
+            if result.exam_id in _pending:
+                _pending[result.exam_id].append(result)
+            board = _boards.get(result.exam_id)
+            if board is not None:
+                board.apply(result.student_id, result.question_id, result.submission_id, result.attempt)
+
+@result_events.subscribe
+def _apply_results(events: List[result_events.ResultEvent]) -> None:
+    _apply([
+        Result(e.exam_id, e.student_id, e.question_id, e.submission_id,
+               Attempt(e.score, e.status == models.ExecutionStatus.ACCEPTED, e.submitted_at))
+        for e in events
+    ])
+    pubsub.publish(TOPIC, [
+        [str(e.exam_id), str(e.student_id), str(e.question_id), str(e.submission_id),
+         e.score, e.status == models.ExecutionStatus.ACCEPTED, e.submitted_at.isoformat()]
+        for e in events
+    ])
+
+@pubsub.subscribe(TOPIC)
+def _apply_relayed(items: list) -> None:
+    _apply([
+        Result(UUID(exam_id), UUID(student_id), UUID(question_id), UUID(submission_id),
+               Attempt(score, accepted, datetime.fromisoformat(submitted_at)))
+        for exam_id, student_id, question_id, submission_id, score, accepted, submitted_at in items
+    ])
+
+@pubsub.on_resync
+def _drop_boards() -> None:
+    # Rebuilt from the DB on next use
+    _boards.clear()
@@ -3,22 +3,31 @@ FastAPI main application for Online Exam System
 Generated routes for all models
 """
 
-from typing import List
+import json
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from backend.config import settings
-from backend.database import Base, engine, get_db, SessionLocal
-from backend import crud, schemas
+from backend.database import Base, engine, get_db, SessionLocal, async_engine, get_async_db, pool_status, replica_status
+from backend import crud, schemas, async_crud, audit, dashboard, exam_paper, export, grading, grading_cache, heartbeats, leaderboard, partitions, pubsub, replication, session_cache, startup, submission_updates
+from backend import request_metrics
 from backend.wait_for_db import wait_for_db
+from backend.pagination import AttemptCursor, Cursor, ResultCursor, decode_cursor, encode_cursor
 
 from backend import models, schemas, crud
 
 # --- App init ---
 app = FastAPI(title="Online Exam System API", version="1.0.0")
+# Every route declared below records per-route metrics (see request_metrics)
+app.router.route_class = request_metrics.MetricsRoute
 
 # --- Security headers middleware (basic hardening) ---
 @app.middleware("http")
@@ -39,31 +48,155 @@ if settings.cors_origins:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
 
 # --- Startup: wait for DB & create tables ---
+# Each phase is timed and logged; the readiness probe passes once all ran.
 @app.on_event("startup")
 def on_startup():
-    wait_for_db(engine, timeout=60)
-    # Import models so Base is populated
-    import backend.models 
-    Base.metadata.create_all(bind=engine)
+    with startup.phase("wait_for_db"):
+        wait_for_db(engine, timeout=60)
+    with startup.phase("schema"):
+        # Skips create_all when the stored schema fingerprint matches the models
+        startup.ensure_schema(engine)
+    with startup.phase("partitions"):
+        # Partitions must exist before the event tables take inserts
+        partitions.run_maintenance(engine)
+    with startup.phase("leaderboards"):
+        with SessionLocal() as db:
+            leaderboard.warm(db)
+
+@app.on_event("startup")
+async def start_background_workers():
+    with startup.phase("background_workers"):
+        grading.start()
+        partitions.start(engine)
+        audit.start()
+        heartbeats.start()
+        submission_updates.start()
+        pubsub.start()
+        replication.start()
+    startup.mark_ready()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    startup.mark_not_ready()
+    await grading.stop()
+    await partitions.stop()
+    await heartbeats.stop()
+    await pubsub.stop()
+    await replication.stop()
+    # Drain queued audit entries while the database is still reachable
+    audit.stop()
+    await async_engine.dispose()
 
 # --- Health check ---
+# Liveness: the process is serving (no dependencies checked).
 @app.get("/health", tags=["health"])
+@app.get("/health/live", tags=["health"])
 def health() -> dict:
     return {"status": "ok"}
 
+# Readiness: startup finished, not shutting down, and the database answers.
+@app.get("/health/ready", tags=["health"])
+def health_ready():
+    body = {"status": "ok", "startup_phases": startup.phases}
+    if not startup.is_ready():
+        body["status"] = "starting"
+        return JSONResponse(body, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        body.update(status="unavailable", detail=f"database: {e.__class__.__name__}")
+        return JSONResponse(body, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return body
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/pool", tags=["health"])
+def health_pool() -> dict:
+    return pool_status()
+
+@app.get("/health/replicas", tags=["health"])
+def health_replicas() -> dict:
+    return replica_status()
+
+@app.get("/grading/cache", tags=["grading"])
+def grading_cache_stats() -> dict:
+    return grading_cache.stats()
+
+# --- Session token validation ---
+# Resolve session tokens through the in-memory validation cache; use these
+# as dependencies on authenticated routes.
+async def current_user_session(
+    x_session_token: str = Header(...), db: AsyncSession = Depends(get_async_db)
+) -> schemas.ValidatedSession:
+    validated = await session_cache.validate_user_session(db, x_session_token)
+    if validated is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired session")
+    return validated
+
+async def current_exam_session(
+    x_exam_session_token: str = Header(...), db: AsyncSession = Depends(get_async_db)
+) -> schemas.ValidatedSession:
+    validated = await session_cache.validate_exam_session(db, x_exam_session_token)
+    if validated is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or inactive exam session")
+    return validated
+
+# --- Pagination helpers ---
+# List routes accept `?after=<cursor>` for keyset pagination; `skip` is kept for
+# backwards compatibility. A full page carries the next cursor in X-Next-Cursor.
+# Nested routes keep their own order and use a matching cursor type.
+def _parse_cursor(after: Optional[str], cursor_type=Cursor):
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after, cursor_type)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _set_next_cursor(response: Response, rows: list, limit: int, cursor_type=Cursor) -> None:
+    if rows and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1], cursor_type)
+
+# --- Sparse fieldsets ---
+# `?fields=a,b` narrows list/detail responses, and the SELECT behind them, to
+# those columns. id and created_at are always returned.
+def _fields(schema):
+    allowed = set(schema.__fields__)
+    def parse(fields: Optional[str] = None) -> Optional[List[str]]:
+        if not fields:
+            return None
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(requested) - allowed)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return requested
+    return parse
+
+def _requested_only(rows: list, fields: Optional[List[str]]) -> list:
+    # Drop columns selected only to build the next cursor
+    if not fields:
+        return rows
+    keep = list(dict.fromkeys([*crud.KEY_COLUMNS, *fields]))
+    return [{name: getattr(row, name) for name in keep} for row in rows]
+
 
 # User routes
-@app.get("/users/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
+@app.get("/users/", response_model=List[schemas.UserPartial], response_model_exclude_unset=True)
+def read_users(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, role: Optional[models.UserRole] = None, is_active: Optional[bool] = None, fields: Optional[List[str]] = Depends(_fields(schemas.User)), db: Session = Depends(get_db)):
+    users = crud.get_users(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, role=role, is_active=is_active)
+    _set_next_cursor(response, users, limit)
     return users
 
-@app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(user_id: UUID, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, id=user_id)
+@app.get("/users/{user_id}", response_model=schemas.UserPartial, response_model_exclude_unset=True)
+def read_user(user_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.User)), db: Session = Depends(get_db)):
+    db_user = crud.get_user(db, id=user_id, fields=fields)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
@@ -87,14 +220,19 @@ def delete_user(user_id: UUID, db: Session = Depends(get_db)):
     return db_user
 
 # UserSession routes
-@app.get("/user-sessions/", response_model=List[schemas.UserSession])
-def read_user_sessions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    user_sessions = crud.get_user_sessions(db, skip=skip, limit=limit)
+@app.get("/user-sessions/", response_model=List[schemas.UserSessionPartial], response_model_exclude_unset=True)
+def read_user_sessions(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, user_id: Optional[UUID] = None, fields: Optional[List[str]] = Depends(_fields(schemas.UserSession)), db: Session = Depends(get_db)):
+    user_sessions = crud.get_user_sessions(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, user_id=user_id)
+    _set_next_cursor(response, user_sessions, limit)
     return user_sessions
 
-@app.get("/user-sessions/{session_id}", response_model=schemas.UserSession)
-def read_user_session(session_id: UUID, db: Session = Depends(get_db)):
-    db_session = crud.get_user_session(db, id=session_id)
+@app.get("/user-sessions/me", response_model=schemas.ValidatedSession)
+async def read_current_user_session(session: schemas.ValidatedSession = Depends(current_user_session)):
+    return session
+
+@app.get("/user-sessions/{session_id}", response_model=schemas.UserSessionPartial, response_model_exclude_unset=True)
+async def read_user_session(session_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.UserSession)), db: AsyncSession = Depends(get_async_db)):
+    db_session = await async_crud.get_user_session(db, id=session_id, fields=fields)
     if db_session is None:
         raise HTTPException(status_code=404, detail="User session not found")
     return db_session
@@ -118,14 +256,15 @@ def delete_user_session(session_id: UUID, db: Session = Depends(get_db)):
     return db_session
 
 # UserToken routes
-@app.get("/user-tokens/", response_model=List[schemas.UserToken])
-def read_user_tokens(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    user_tokens = crud.get_user_tokens(db, skip=skip, limit=limit)
+@app.get("/user-tokens/", response_model=List[schemas.UserTokenPartial], response_model_exclude_unset=True)
+def read_user_tokens(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, user_id: Optional[UUID] = None, token_type: Optional[str] = None, fields: Optional[List[str]] = Depends(_fields(schemas.UserToken)), db: Session = Depends(get_db)):
+    user_tokens = crud.get_user_tokens(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, user_id=user_id, token_type=token_type)
+    _set_next_cursor(response, user_tokens, limit)
     return user_tokens
 
-@app.get("/user-tokens/{token_id}", response_model=schemas.UserToken)
-def read_user_token(token_id: UUID, db: Session = Depends(get_db)):
-    db_token = crud.get_user_token(db, id=token_id)
+@app.get("/user-tokens/{token_id}", response_model=schemas.UserTokenPartial, response_model_exclude_unset=True)
+def read_user_token(token_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.UserToken)), db: Session = Depends(get_db)):
+    db_token = crud.get_user_token(db, id=token_id, fields=fields)
     if db_token is None:
         raise HTTPException(status_code=404, detail="User token not found")
     return db_token
@@ -149,14 +288,15 @@ def delete_user_token(token_id: UUID, db: Session = Depends(get_db)):
     return db_token
 
 # StudentProfile routes
-@app.get("/student-profiles/", response_model=List[schemas.StudentProfile])
-def read_student_profiles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    student_profiles = crud.get_student_profiles(db, skip=skip, limit=limit)
+@app.get("/student-profiles/", response_model=List[schemas.StudentProfilePartial], response_model_exclude_unset=True)
+def read_student_profiles(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, user_id: Optional[UUID] = None, fields: Optional[List[str]] = Depends(_fields(schemas.StudentProfile)), db: Session = Depends(get_db)):
+    student_profiles = crud.get_student_profiles(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, user_id=user_id)
+    _set_next_cursor(response, student_profiles, limit)
     return student_profiles
 
-@app.get("/student-profiles/{profile_id}", response_model=schemas.StudentProfile)
-def read_student_profile(profile_id: UUID, db: Session = Depends(get_db)):
-    db_profile = crud.get_student_profile(db, id=profile_id)
+@app.get("/student-profiles/{profile_id}", response_model=schemas.StudentProfilePartial, response_model_exclude_unset=True)
+def read_student_profile(profile_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.StudentProfile)), db: Session = Depends(get_db)):
+    db_profile = crud.get_student_profile(db, id=profile_id, fields=fields)
     if db_profile is None:
         raise HTTPException(status_code=404, detail="Student profile not found")
     return db_profile
@@ -180,14 +320,15 @@ def delete_student_profile(profile_id: UUID, db: Session = Depends(get_db)):
     return db_profile
 
 # StudentExamQuestion routes
-@app.get("/student-exam-questions/", response_model=List[schemas.StudentExamQuestion])
-def read_student_exam_questions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    student_exam_questions = crud.get_student_exam_questions(db, skip=skip, limit=limit)
+@app.get("/student-exam-questions/", response_model=List[schemas.StudentExamQuestionPartial], response_model_exclude_unset=True)
+def read_student_exam_questions(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, exam_id: Optional[UUID] = None, student_id: Optional[UUID] = None, question_id: Optional[UUID] = None, fields: Optional[List[str]] = Depends(_fields(schemas.StudentExamQuestion)), db: Session = Depends(get_db)):
+    student_exam_questions = crud.get_student_exam_questions(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, exam_id=exam_id, student_id=student_id, question_id=question_id)
+    _set_next_cursor(response, student_exam_questions, limit)
     return student_exam_questions
 
-@app.get("/student-exam-questions/{question_id}", response_model=schemas.StudentExamQuestion)
-def read_student_exam_question(question_id: UUID, db: Session = Depends(get_db)):
-    db_question = crud.get_student_exam_question(db, id=question_id)
+@app.get("/student-exam-questions/{question_id}", response_model=schemas.StudentExamQuestionPartial, response_model_exclude_unset=True)
+def read_student_exam_question(question_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.StudentExamQuestion)), db: Session = Depends(get_db)):
+    db_question = crud.get_student_exam_question(db, id=question_id, fields=fields)
     if db_question is None:
         raise HTTPException(status_code=404, detail="Student exam question not found")
     return db_question
@@ -211,14 +352,15 @@ def delete_student_exam_question(question_id: UUID, db: Session = Depends(get_db
     return db_question
 
 # TeacherProfile routes
-@app.get("/teacher-profiles/", response_model=List[schemas.TeacherProfile])
-def read_teacher_profiles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    teacher_profiles = crud.get_teacher_profiles(db, skip=skip, limit=limit)
+@app.get("/teacher-profiles/", response_model=List[schemas.TeacherProfilePartial], response_model_exclude_unset=True)
+def read_teacher_profiles(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, user_id: Optional[UUID] = None, fields: Optional[List[str]] = Depends(_fields(schemas.TeacherProfile)), db: Session = Depends(get_db)):
+    teacher_profiles = crud.get_teacher_profiles(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, user_id=user_id)
+    _set_next_cursor(response, teacher_profiles, limit)
     return teacher_profiles
 
-@app.get("/teacher-profiles/{profile_id}", response_model=schemas.TeacherProfile)
-def read_teacher_profile(profile_id: UUID, db: Session = Depends(get_db)):
-    db_profile = crud.get_teacher_profile(db, id=profile_id)
+@app.get("/teacher-profiles/{profile_id}", response_model=schemas.TeacherProfilePartial, response_model_exclude_unset=True)
+def read_teacher_profile(profile_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.TeacherProfile)), db: Session = Depends(get_db)):
+    db_profile = crud.get_teacher_profile(db, id=profile_id, fields=fields)
     if db_profile is None:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
     return db_profile
@@ -242,14 +384,15 @@ def delete_teacher_profile(profile_id: UUID, db: Session = Depends(get_db)):
     return db_profile
 
 # QuestionCategory routes
-@app.get("/question-categories/", response_model=List[schemas.QuestionCategory])
-def read_question_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    question_categories = crud.get_question_categories(db, skip=skip, limit=limit)
+@app.get("/question-categories/", response_model=List[schemas.QuestionCategoryPartial], response_model_exclude_unset=True)
+def read_question_categories(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, is_active: Optional[bool] = None, fields: Optional[List[str]] = Depends(_fields(schemas.QuestionCategory)), db: Session = Depends(get_db)):
+    question_categories = crud.get_question_categories(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, is_active=is_active)
+    _set_next_cursor(response, question_categories, limit)
     return question_categories
 
-@app.get("/question-categories/{category_id}", response_model=schemas.QuestionCategory)
-def read_question_category(category_id: UUID, db: Session = Depends(get_db)):
-    db_category = crud.get_question_category(db, id=category_id)
+@app.get("/question-categories/{category_id}", response_model=schemas.QuestionCategoryPartial, response_model_exclude_unset=True)
+def read_question_category(category_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.QuestionCategory)), db: Session = Depends(get_db)):
+    db_category = crud.get_question_category(db, id=category_id, fields=fields)
     if db_category is None:
         raise HTTPException(status_code=404, detail="Question category not found")
     return db_category
@@ -273,14 +416,28 @@ def delete_question_category(category_id: UUID, db: Session = Depends(get_db)):
     return db_category
 
 # Question routes
-@app.get("/questions/", response_model=List[schemas.Question])
-def read_questions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    questions = crud.get_questions(db, skip=skip, limit=limit)
+@app.get("/questions/", response_model=List[schemas.QuestionPartial], response_model_exclude_unset=True)
+def read_questions(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, category_id: Optional[UUID] = None, difficulty: Optional[models.Difficulty] = None, is_active: Optional[bool] = None, created_by: Optional[UUID] = None, fields: Optional[List[str]] = Depends(_fields(schemas.Question)), db: Session = Depends(get_db)):
+    questions = crud.get_questions(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, category_id=category_id, difficulty=difficulty, is_active=is_active, created_by=created_by)
+    _set_next_cursor(response, questions, limit)
     return questions
 
-@app.get("/questions/{question_id}", response_model=schemas.Question)
-def read_question(question_id: UUID, db: Session = Depends(get_db)):
-    db_question = crud.get_question(db, id=question_id)
+# Ranked full-text search over title, description and problem_statement
+@app.get("/questions/search", response_model=List[schemas.QuestionSearchResult])
+def search_questions(
+    q: str = Query(..., min_length=1, max_length=500),
+    category_id: Optional[UUID] = None,
+    difficulty: Optional[models.Difficulty] = None,
+    is_active: Optional[bool] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    return crud.search_questions(db, q, category_id=category_id, difficulty=difficulty, is_active=is_active, skip=skip, limit=limit)
+
+@app.get("/questions/{question_id}", response_model=schemas.QuestionPartial, response_model_exclude_unset=True)
+def read_question(question_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.Question)), db: Session = Depends(get_db)):
+    db_question = crud.get_question(db, id=question_id, fields=fields)
     if db_question is None:
         raise HTTPException(status_code=404, detail="Question not found")
     return db_question
@@ -295,3 +452,211 @@ def update_question(question_id: UUID, question: schemas.QuestionUpdate, db: Ses
     if db_question is None:
         raise HTTPException(status_code=404, detail="Question not found")
     return crud.update_question(db=db, db_obj=db_question, obj_in=question)
+
+# Exam routes
+@app.get("/exams/{exam_id}/paper", response_model=schemas.ExamPaper)
+def read_exam_paper(exam_id: UUID, request: Request, db: Session = Depends(get_db)):
+    paper = exam_paper.get_paper(db, exam_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    headers = {"ETag": paper.etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == paper.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=paper.body, media_type="application/json", headers=headers)
+
+@app.get("/exams/{exam_id}/leaderboard", response_model=schemas.Leaderboard)
+def read_exam_leaderboard(exam_id: UUID, request: Request, response: Response, limit: int = Query(10, ge=1, le=1000), db: Session = Depends(get_db)):
+    board = leaderboard.get_board(db, exam_id)
+    if board is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    etag = board.etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return schemas.Leaderboard(exam_id=exam_id, participants=len(board), entries=board.top(limit))
+
+@app.get("/exams/{exam_id}/leaderboard/students/{student_id}", response_model=schemas.LeaderboardEntry)
+def read_exam_leaderboard_rank(exam_id: UUID, student_id: UUID, request: Request, response: Response, db: Session = Depends(get_db)):
+    board = leaderboard.get_board(db, exam_id)
+    if board is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    etag = board.etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    entry = board.rank_of(student_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Student not on the leaderboard")
+    response.headers["ETag"] = etag
+    return entry
+
+# One INSERT ... SELECT for all approved registrations; safe to re-run
+@app.post("/exams/{exam_id}/sessions/provision", response_model=schemas.ExamSessionProvisioning)
+def provision_exam_sessions(exam_id: UUID, db: Session = Depends(get_db)):
+    provisioned = crud.provision_exam_sessions(db, exam_id)
+    if provisioned is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    approved, created = provisioned
+    return schemas.ExamSessionProvisioning(exam_id=exam_id, approved=approved, created=created, existing=approved - created)
+
+@app.get("/exams/{exam_id}/idle-sessions", response_model=List[schemas.IdleSession])
+async def read_idle_exam_sessions(exam_id: UUID, idle_seconds: Optional[float] = Query(None, gt=0), db: AsyncSession = Depends(get_async_db)):
+    return await heartbeats.idle_sessions(db, exam_id, idle_seconds or settings.heartbeat_idle_seconds)
+
+@app.get("/exams/{exam_id}/full", response_model=schemas.ExamWithQuestions)
+def read_exam_with_questions(exam_id: UUID, db: Session = Depends(get_db)):
+    db_exam = crud.get_exam_with_questions(db, id=exam_id)
+    if db_exam is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return db_exam
+
+@app.get("/exams/{exam_id}/results/export")
+def export_exam_results(exam_id: UUID, format: str = "ndjson", db: Session = Depends(get_db)):
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if crud.get_exam(db, id=exam_id, fields=["id"]) is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    headers = {"Content-Disposition": f'attachment; filename="exam-{exam_id}-results.{format}"'}
+    return StreamingResponse(
+        export.stream_exam_results(exam_id, format),
+        media_type=export.EXPORT_FORMATS[format],
+        headers=headers,
+    )
+
+# ExamSession routes
+@app.get("/exam-sessions/me", response_model=schemas.ValidatedSession)
+async def read_current_exam_session(session: schemas.ValidatedSession = Depends(current_exam_session)):
+    return session
+
+# Heartbeats only touch in-memory state; they reach the database in batches (see heartbeats)
+@app.post("/exam-sessions/me/heartbeat", status_code=status.HTTP_204_NO_CONTENT)
+async def exam_session_heartbeat(session: schemas.ValidatedSession = Depends(current_exam_session)):
+    heartbeats.beat(session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.get("/exam-sessions/{session_id}/submissions", response_model=List[schemas.SubmissionPartial], response_model_exclude_unset=True)
+def read_exam_session_submissions(session_id: UUID, response: Response, question_id: Optional[UUID] = None, limit: int = Query(100, ge=1, le=1000), after: Optional[str] = None, fields: Optional[List[str]] = Depends(_fields(schemas.Submission)), db: Session = Depends(get_db)):
+    submissions = crud.get_submission_attempts(db, exam_session_id=session_id, question_id=question_id, limit=limit, after=_parse_cursor(after, AttemptCursor), fields=fields)
+    _set_next_cursor(response, submissions, limit, AttemptCursor)
+    return _requested_only(submissions, fields)
+
+@app.get("/exam-sessions/{session_id}", response_model=schemas.ExamSessionPartial, response_model_exclude_unset=True)
+async def read_exam_session(session_id: UUID, fields: Optional[List[str]] = Depends(_fields(schemas.ExamSession)), db: AsyncSession = Depends(get_async_db)):
+    db_session = await async_crud.get_exam_session(db, id=session_id, fields=fields)
+    if db_session is None:
+        raise HTTPException(status_code=404, detail="Exam session not found")
+    return db_session
+
+# Student dashboard routes
+@app.get("/students/{student_id}/dashboard", response_model=schemas.StudentDashboard)
+def read_student_dashboard(student_id: UUID, db: Session = Depends(get_db)):
+    db_dashboard = dashboard.get_dashboard(db, student_id)
+    if db_dashboard is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return db_dashboard
+
+# Server-Sent Events: "status" and "result" events for the student's submissions
+# (see submission_updates). Open the stream before submitting to miss nothing.
+# Only the student themself, or a teacher or admin, may follow the stream.
+@app.get("/students/{student_id}/submission-updates", response_class=StreamingResponse)
+async def stream_submission_updates(student_id: UUID, session: schemas.ValidatedSession = Depends(current_user_session), db: AsyncSession = Depends(get_async_db)):
+    if session.user_id != student_id:
+        if await async_crud.get_user_role(db, session.user_id) not in (models.UserRole.TEACHER, models.UserRole.ADMIN):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to follow this student's submissions")
+        if await async_crud.get_user_role(db, student_id) is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+    return StreamingResponse(
+        submission_updates.stream(student_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Submission routes
+@app.post("/submissions/", response_model=schemas.Submission)
+async def create_submission(submission: schemas.SubmissionCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_submission(db=db, obj_in=submission)
+
+@app.get("/submissions/", response_model=List[schemas.SubmissionPartial], response_model_exclude_unset=True)
+def read_submissions(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, exam_session_id: Optional[UUID] = None, question_id: Optional[UUID] = None, student_id: Optional[UUID] = None, status: Optional[models.SubmissionStatus] = None, fields: Optional[List[str]] = Depends(_fields(schemas.Submission)), db: Session = Depends(get_db)):
+    submissions = crud.get_submissions(db, skip=skip, limit=limit, after=_parse_cursor(after), fields=fields, exam_session_id=exam_session_id, question_id=question_id, student_id=student_id, status=status)
+    _set_next_cursor(response, submissions, limit)
+    return submissions
+
+@app.get("/submissions/{submission_id}/results", response_model=List[schemas.SubmissionResultPartial], response_model_exclude_unset=True)
+def read_submission_results(submission_id: UUID, response: Response, limit: int = Query(100, ge=1, le=1000), after: Optional[str] = None, fields: Optional[List[str]] = Depends(_fields(schemas.SubmissionResult)), db: Session = Depends(get_db)):
+    results = crud.get_results_for_submission(db, submission_id=submission_id, limit=limit, after=_parse_cursor(after, ResultCursor), fields=fields)
+    _set_next_cursor(response, results, limit, ResultCursor)
+    return _requested_only(results, fields)
+
+@app.get("/submissions/{submission_id}/full", response_model=schemas.SubmissionWithDetails)
+def read_submission_with_details(submission_id: UUID, db: Session = Depends(get_db)):
+    db_submission = crud.get_submission_with_details(db, id=submission_id)
+    if db_submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return db_submission
+
+# SubmissionEvent routes
+@app.post("/submission-events/", response_model=schemas.SubmissionEvent)
+async def create_submission_event(event: schemas.SubmissionEventCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_submission_event(db=db, obj_in=event)
+
+# ExamEvent routes
+@app.post("/exam-events/", response_model=schemas.ExamEvent)
+async def create_exam_event(event: schemas.ExamEventCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_exam_event(db=db, obj_in=event)
+
+# Batch event ingestion routes
+# Accept a JSON array or NDJSON (Content-Type: application/x-ndjson) of events
+# and write each batch with a single multi-row INSERT.
+MAX_EVENT_BATCH = 5000
+
+async def _read_event_batch(request: Request) -> list:
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed JSON body")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON body")
+    if len(items) > MAX_EVENT_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_EVENT_BATCH} events")
+    return items
+
+async def _ingest_events(db: AsyncSession, items: list, schema, create_bulk, missing_parent: str) -> schemas.BatchIngestResult:
+    results: List[Optional[schemas.BatchItemResult]] = [None] * len(items)
+    valid, positions = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(schema.parse_obj(item))
+            positions.append(index)
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[index] = schemas.BatchItemResult(index=index, accepted=False, error=error)
+    ids = await create_bulk(db, valid) if valid else []
+    for index, new_id in zip(positions, ids):
+        if new_id is None:
+            results[index] = schemas.BatchItemResult(index=index, accepted=False, error=missing_parent)
+        else:
+            results[index] = schemas.BatchItemResult(index=index, accepted=True, id=new_id)
+    accepted = sum(1 for r in results if r.accepted)
+    return schemas.BatchIngestResult(accepted=accepted, rejected=len(results) - accepted, items=results)
+
+@app.post("/exam-events/batch", response_model=schemas.BatchIngestResult)
+async def ingest_exam_events(request: Request, db: AsyncSession = Depends(get_async_db)):
+    items = await _read_event_batch(request)
+    return await _ingest_events(db, items, schemas.ExamEventCreate, async_crud.create_exam_events_bulk, "Exam session not found")
+
+@app.post("/submission-events/batch", response_model=schemas.BatchIngestResult)
+async def ingest_submission_events(request: Request, db: AsyncSession = Depends(get_async_db)):
+    items = await _read_event_batch(request)
+    return await _ingest_events(db, items, schemas.SubmissionEventCreate, async_crud.create_submission_events_bulk, "Submission not found")
+
+# AuditLog routes
+@app.post("/audit-logs/", response_model=schemas.AuditLog, status_code=status.HTTP_202_ACCEPTED)
+def create_audit_log(entry: schemas.AuditLogCreate):
+    queued = audit.record(entry)
+    if queued is None:
+        raise HTTPException(status_code=503, detail="Audit buffer full", headers={"Retry-After": "1"})
+    return queued
@@ -0,0 +1,168 @@
+"""
+Lightweight in-process metrics primitives for Online Exam System
+"""
+
+import bisect
+import threading
+from typing import Sequence
+
+# Seconds; suits both DB pool waits and request latencies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. `observe` is O(log buckets) under a lock.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Cumulative bucket counts keyed by upper bound in exposition form
+        ("0.005", ..., "+Inf"; JSON has no infinity), plus sum and count.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = {}, 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            running += count
+            cumulative[_format_value(bound)] = running
+        return {"buckets": cumulative, "sum": total, "count": running}
+
+
+# --- Labeled metric families and Prometheus text exposition ---
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.collect().items())
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class CallbackGauge(Gauge):
+    """
+    Gauge whose samples are read from `callback() -> {labels: value}` at scrape time.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], callback):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def collect(self) -> dict:
+        return self.callback()
+
+
+class LabeledHistogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: dict = {}
+        self._lock = threading.Lock()
+
+    def labels(self, labels: tuple) -> Histogram:
+        child = self._children.get(labels)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labels, Histogram(self.buckets))
+        return child
+
+    def observe(self, labels: tuple, value: float) -> None:
+        self.labels(labels).observe(value)
+
+    def render(self) -> list:
+        lines = []
+        for labels, child in sorted(self._children.items()):
+            lines.extend(render_histogram(self.name, self.labelnames, labels, child.snapshot()))
+        return lines
+
+
+def render_histogram(name: str, labelnames: Sequence[str], labels: tuple, snapshot: dict) -> list:
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        le = f'le="{bound}"'
+        lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {count}")
+    lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count{_format_labels(labelnames, labels)} {snapshot['count']}")
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -5,12 +5,12 @@ Generated from Mermaid ER Diagram
 
 from sqlalchemy import (
     Column, String, Text, Boolean, Integer, Float, DateTime, JSON,
-    ForeignKey, UniqueConstraint, Index, Enum as SQLEnum
+    ForeignKey, UniqueConstraint, Index, Computed, Enum as SQLEnum
 )
-from sqlalchemy.dialects.postgresql import UUID, INET, JSONB
+from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func, text
 import uuid
 import enum
 from datetime import datetime
@@ -110,6 +110,7 @@ class User(Base):
         Index("idx_users_email", "email"),
         Index("idx_users_role", "role"),
         Index("idx_users_is_active", "is_active"),
+        Index("idx_users_created_at_id", "created_at", "id"),
     )
 
 class UserSession(Base):
@@ -132,6 +133,7 @@ class UserSession(Base):
         Index("idx_user_sessions_user_id", "user_id"),
         Index("idx_user_sessions_expires_at", "expires_at"),
         Index("idx_user_sessions_token", "session_token"),
+        Index("idx_user_sessions_created_at_id", "created_at", "id"),
     )
 
 class UserToken(Base):
@@ -153,6 +155,7 @@ class UserToken(Base):
         Index("idx_user_tokens_user_id", "user_id"),
         Index("idx_user_tokens_type", "token_type"),
         Index("idx_user_tokens_expires_at", "expires_at"),
+        Index("idx_user_tokens_created_at_id", "created_at", "id"),
     )
 
 class StudentProfile(Base):
@@ -176,6 +179,7 @@ class StudentProfile(Base):
     __table_args__ = (
         Index("idx_student_profiles_user_id", "user_id"),
         Index("idx_student_profiles_student_id", "student_id"),
+        Index("idx_student_profiles_created_at_id", "created_at", "id"),
     )
 
 class StudentExamQuestion(Base):
@@ -202,6 +206,7 @@ class StudentExamQuestion(Base):
         Index("idx_student_exam_questions_exam_id", "exam_id"),
         Index("idx_student_exam_questions_student_id", "student_id"),
         Index("idx_student_exam_questions_question_id", "question_id"),
+        Index("idx_student_exam_questions_created_at_id", "created_at", "id"),
     )
 
 class TeacherProfile(Base):
@@ -224,6 +229,7 @@ class TeacherProfile(Base):
     __table_args__ = (
         Index("idx_teacher_profiles_user_id", "user_id"),
         Index("idx_teacher_profiles_employee_id", "employee_id"),
+        Index("idx_teacher_profiles_created_at_id", "created_at", "id"),
     )
 
 # Question Bank Models
@@ -244,8 +250,17 @@ class QuestionCategory(Base):
     __table_args__ = (
         Index("idx_question_categories_name", "name"),
         Index("idx_question_categories_is_active", "is_active"),
+        Index("idx_question_categories_created_at_id", "created_at", "id"),
     )
 
+# Weighted so title matches rank above description, then problem_statement matches
+QUESTION_SEARCH_CONFIG = "english"
+QUESTION_SEARCH_DOCUMENT = (
+    f"setweight(to_tsvector('{QUESTION_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{QUESTION_SEARCH_CONFIG}', coalesce(description, '')), 'B') || "
+    f"setweight(to_tsvector('{QUESTION_SEARCH_CONFIG}', coalesce(problem_statement, '')), 'C')"
+)
+
 class Question(Base):
     __tablename__ = "questions"
     
@@ -264,6 +279,8 @@ class Question(Base):
     created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), nullable=False)
     extra_data = Column(JSONB, default=dict)
+    # Full-text search document, maintained by Postgres; deferred so ORM loads skip it
+    search_vector = deferred(Column(TSVECTOR, Computed(QUESTION_SEARCH_DOCUMENT, persisted=True)))
     
     # Relationships
     category = relationship("QuestionCategory", back_populates="questions")
@@ -278,6 +295,8 @@ class Question(Base):
         Index("idx_questions_created_by", "created_by"),
         Index("idx_questions_difficulty", "difficulty"),
         Index("idx_questions_is_active", "is_active"),
+        Index("idx_questions_created_at_id", "created_at", "id"),
+        Index("idx_questions_search_vector", "search_vector", postgresql_using="gin"),
     )
 
 class QuestionTestCase(Base):
@@ -300,6 +319,7 @@ class QuestionTestCase(Base):
     __table_args__ = (
         Index("idx_question_test_cases_question_id", "question_id"),
         Index("idx_question_test_cases_is_sample", "is_sample"),
+        Index("idx_question_test_cases_created_at_id", "created_at", "id"),
     )
 
 # Exam Models
@@ -324,7 +344,7 @@ class Exam(Base):
     
     # Relationships
     creator = relationship("User", foreign_keys=[created_by], back_populates="created_exams")
-    exam_questions = relationship("ExamQuestion", back_populates="exam", cascade="all, delete-orphan")
+    exam_questions = relationship("ExamQuestion", back_populates="exam", cascade="all, delete-orphan", order_by="ExamQuestion.question_order")
     exam_registrations = relationship("ExamRegistration", back_populates="exam", cascade="all, delete-orphan")
     exam_sessions = relationship("ExamSession", back_populates="exam", cascade="all, delete-orphan")
     assigned_questions = relationship("StudentExamQuestion", back_populates="exam")
@@ -335,6 +355,7 @@ class Exam(Base):
         Index("idx_exams_end_time", "end_time"),
         Index("idx_exams_status", "status"),
         Index("idx_exams_exam_type", "exam_type"),
+        Index("idx_exams_created_at_id", "created_at", "id"),
     )
 
 class ExamQuestion(Base):
@@ -358,6 +379,7 @@ class ExamQuestion(Base):
         UniqueConstraint("exam_id", "question_order", name="uq_exam_questions_exam_order"),
         Index("idx_exam_questions_exam_id", "exam_id"),
         Index("idx_exam_questions_question_id", "question_id"),
+        Index("idx_exam_questions_created_at_id", "created_at", "id"),
     )
 
 class ExamRegistration(Base):
@@ -384,6 +406,7 @@ class ExamRegistration(Base):
         Index("idx_exam_registrations_exam_id", "exam_id"),
         Index("idx_exam_registrations_student_id", "student_id"),
         Index("idx_exam_registrations_status", "status"),
+        Index("idx_exam_registrations_created_at_id", "created_at", "id"),
     )
 
 class ExamSession(Base):
@@ -414,6 +437,7 @@ class ExamSession(Base):
         Index("idx_exam_sessions_student_id", "student_id"),
         Index("idx_exam_sessions_status", "status"),
         Index("idx_exam_sessions_token", "session_token"),
+        Index("idx_exam_sessions_created_at_id", "created_at", "id"),
     )
 
 # Submission Models
@@ -441,11 +465,13 @@ class Submission(Base):
     submission_events = relationship("SubmissionEvent", back_populates="submission", cascade="all, delete-orphan")
     
     __table_args__ = (
-        Index("idx_submissions_exam_session_id", "exam_session_id"),
+        # Also serves exam_session_id-only lookups (leftmost prefix)
+        Index("idx_submissions_session_question_attempt_id", "exam_session_id", "question_id", "attempt_number", "id"),
         Index("idx_submissions_question_id", "question_id"),
         Index("idx_submissions_student_id", "student_id"),
         Index("idx_submissions_status", "status"),
         Index("idx_submissions_submitted_at", "submitted_at"),
+        Index("idx_submissions_created_at_id", "created_at", "id"),
     )
 
 class SubmissionResult(Base):
@@ -454,6 +480,8 @@ class SubmissionResult(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), nullable=False)
     judge0_token = Column(String(255))
+    # Content hash of language, code and test set (see grading_cache)
+    grading_key = Column(String(64))
     status = Column(SQLEnum(ExecutionStatus), nullable=False)
     stdout = Column(Text)
     stderr = Column(Text)
@@ -473,9 +501,21 @@ class SubmissionResult(Base):
     submission = relationship("Submission", back_populates="submission_results")
     
     __table_args__ = (
-        Index("idx_submission_results_submission_id", "submission_id"),
+        # Also serves submission_id-only lookups (leftmost prefix)
+        Index("idx_submission_results_submission_evaluated_at", "submission_id", "evaluated_at"),
         Index("idx_submission_results_status", "status"),
+        # Poll queue of the grading dispatcher (claim_running_results)
+        Index(
+            "idx_submission_results_running_updated_at", "updated_at",
+            postgresql_where=text("status = 'RUNNING'"),
+        ),
         Index("idx_submission_results_evaluated_at", "evaluated_at"),
+        Index("idx_submission_results_created_at_id", "created_at", "id"),
+        # Grading cache fallback: latest result per key
+        Index(
+            "idx_submission_results_grading_key", "grading_key", "evaluated_at",
+            postgresql_where=text("grading_key IS NOT NULL"),
+        ),
     )
 
 class SubmissionEvent(Base):
@@ -485,7 +525,8 @@ class SubmissionEvent(Base):
     submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), nullable=False)
     event_type = Column(SQLEnum(EventType), nullable=False)
     event_data = Column(JSONB, default=dict)
-    created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    # Partition key, so part of the primary key (see __table_args__)
+    created_at = Column(DateTime(timezone=True), default=func.now(), primary_key=True, nullable=False)
     extra_data = Column(JSONB, default=dict)
     
     # Relationships
@@ -494,7 +535,8 @@ class SubmissionEvent(Base):
     __table_args__ = (
         Index("idx_submission_events_submission_id", "submission_id"),
         Index("idx_submission_events_event_type", "event_type"),
-        Index("idx_submission_events_created_at", "created_at"),
+        Index("idx_submission_events_created_at_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 class ExamEvent(Base):
@@ -504,7 +546,8 @@ class ExamEvent(Base):
     exam_session_id = Column(UUID(as_uuid=True), ForeignKey("exam_sessions.id"), nullable=False)
     event_type = Column(SQLEnum(EventType), nullable=False)
     event_data = Column(JSONB, default=dict)
-    created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    # Partition key, so part of the primary key (see __table_args__)
+    created_at = Column(DateTime(timezone=True), default=func.now(), primary_key=True, nullable=False)
     extra_data = Column(JSONB, default=dict)
     
     # Relationships
@@ -513,7 +556,8 @@ class ExamEvent(Base):
     __table_args__ = (
         Index("idx_exam_events_exam_session_id", "exam_session_id"),
         Index("idx_exam_events_event_type", "event_type"),
-        Index("idx_exam_events_created_at", "created_at"),
+        Index("idx_exam_events_created_at_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 # Audit Model
@@ -529,7 +573,8 @@ class AuditLog(Base):
     new_values = Column(JSONB, default=dict)
     ip_address = Column(INET)
     user_agent = Column(String(500))
-    created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    # Partition key, so part of the primary key (see __table_args__)
+    created_at = Column(DateTime(timezone=True), default=func.now(), primary_key=True, nullable=False)
     extra_data = Column(JSONB, default=dict)
     
     # Relationships
@@ -539,5 +584,15 @@ class AuditLog(Base):
         Index("idx_audit_logs_user_id", "user_id"),
         Index("idx_audit_logs_action", "action"),
         Index("idx_audit_logs_resource_type", "resource_type"),
-        Index("idx_audit_logs_created_at", "created_at"),
-    )
\ No newline at end of file
+        Index("idx_audit_logs_created_at_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+# Rewritten by every worker each REPLICA_LAG_CHECK_INTERVAL, so replicas
+# always have a recent primary commit to measure replay lag against
+class ReplicationHeartbeat(Base):
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime(timezone=True), nullable=False)
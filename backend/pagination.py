@@ -0,0 +1,76 @@
+"""
+Keyset (cursor) pagination helpers for Online Exam System
+"""
+
+import base64
+from datetime import datetime
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+class Cursor(NamedTuple):
+    created_at: datetime
+    id: UUID
+
+
+class AttemptCursor(NamedTuple):
+    """
+    Position in a session's submissions, ordered (question_id, attempt_number, id).
+    """
+    question_id: UUID
+    attempt_number: int
+    id: UUID
+
+
+class ResultCursor(NamedTuple):
+    """
+    Position in a submission's results, ordered newest first by (evaluated_at, id).
+    """
+    evaluated_at: datetime
+    id: UUID
+
+
+_PARSERS = {datetime: datetime.fromisoformat, UUID: UUID, int: int}
+
+
+def encode_cursor(obj, cursor_type=Cursor) -> str:
+    """
+    Build an opaque cursor pointing just after `obj` in `cursor_type`'s key order.
+    """
+    values = (getattr(obj, name) for name in cursor_type._fields)
+    raw = "|".join(v.isoformat() if isinstance(v, datetime) else str(v) for v in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, cursor_type=Cursor):
+    """
+    Parse a cursor produced by `encode_cursor`. Raises ValueError if malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        types = cursor_type.__annotations__.values()
+        if len(parts) != len(types):
+            raise ValueError(token)
+        return cursor_type(*(_PARSERS[t](part) for t, part in zip(types, parts)))
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def paginate(query: Query, model, skip: int = 0, limit: int = 100, after: Optional[Cursor] = None) -> Query:
+    """
+    Order by the indexed (created_at, id) key and apply either a keyset seek
+    (`after`) or the legacy offset. The seek costs the same on every page.
+    """
+    query = query.order_by(model.created_at, model.id)
+    if after is not None:
+        # The plain bound is implied by the row comparison, but only it lets
+        # the planner prune created_at partitions
+        return query.filter(
+            model.created_at >= after.created_at,
+            tuple_(model.created_at, model.id) > tuple_(after.created_at, after.id),
+        ).limit(limit)
+    return query.offset(skip).limit(limit)
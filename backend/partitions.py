@@ -0,0 +1,231 @@
+"""
+Time-range partition maintenance for Online Exam System
+
+exam_events, submission_events and audit_logs are append-only and declared
+PARTITION BY RANGE (created_at) (see models). This keeps one partition per
+month, created PARTITION_PRECREATE_MONTHS ahead, plus a DEFAULT partition so
+an insert never fails for lack of a partition. Rows that land in DEFAULT
+for a month without its partition are moved into the partition when it is
+created. Retention detaches and drops whole partitions older than
+PARTITION_RETENTION_DAYS instead of running DELETEs. Each table is
+maintained in its own transactions. Queries bounded on created_at are
+pruned by the planner to the matching months.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import exc, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key serializing maintenance across workers
+_ADVISORY_LOCK_KEY = 0x70617274
+# DETACH needs an ACCESS EXCLUSIVE lock on the parent; give up rather than
+# queue behind long transactions and stall every insert meanwhile
+_DETACH_LOCK_TIMEOUT = "2s"
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def partitioned_tables() -> List[str]:
+    return [
+        table.name for table in models.Base.metadata.sorted_tables
+        if table.dialect_options["postgresql"].get("partition_by")
+    ]
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    years, index = divmod(month.month - 1 + months, 12)
+    return datetime(month.year + years, index + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.scalar(
+        text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"),
+        {"table": table},
+    ))
+
+
+def list_partitions(conn: Connection, table: str) -> List[str]:
+    return list(conn.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " JOIN pg_class p ON p.oid = i.inhparent"
+            " WHERE p.relname = :table ORDER BY c.relname"
+        ),
+        {"table": table},
+    ))
+
+
+def _lock(conn: Connection, table: str) -> None:
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(:key, hashtext(:table))"), {"key": _ADVISORY_LOCK_KEY, "table": table}
+    )
+
+
+def create_partition(conn: Connection, table: str, start: datetime, end: datetime) -> int:
+    """
+    Create the partition for [start, end). Rows already in DEFAULT for that
+    range would make Postgres refuse it, so they are moved into the new
+    table before it is attached. Returns the number of rows moved.
+    """
+    name = partition_name(table, start)
+    default = f"{table}_default"
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_range = "created_at >= :start AND created_at < :end"
+    params = {"start": start, "end": end}
+    if not conn.scalar(text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE {in_range})'), params):
+        conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+        return 0
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    moved = conn.execute(
+        text(f'WITH moved AS (DELETE FROM "{default}" WHERE {in_range} RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'),
+        params,
+    ).rowcount
+    conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" {bounds}'))
+    logger.warning("Moved %d rows of %s from the DEFAULT partition into %s", moved, table, name)
+    return moved
+
+
+def ensure_partitions(conn: Connection, table: str, now: datetime, ahead: int) -> List[str]:
+    """
+    Create the DEFAULT partition and the monthly ones from `now`'s month to
+    `ahead` months later. Returns the names created.
+    """
+    existing = set(list_partitions(conn, table))
+    created = []
+    if f"{table}_default" not in existing:
+        conn.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+        created.append(f"{table}_default")
+    first = _month_start(now)
+    for offset in range(ahead + 1):
+        start, end = _add_months(first, offset), _add_months(first, offset + 1)
+        name = partition_name(table, start)
+        if name in existing:
+            continue
+        create_partition(conn, table, start, end)
+        created.append(name)
+    return created
+
+
+def expired_partitions(conn: Connection, table: str, now: datetime, retention_days: int) -> List[str]:
+    """
+    Monthly partitions whose whole range is older than the retention window.
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = now - timedelta(days=retention_days)
+    expired = []
+    for name in list_partitions(conn, table):
+        match = _MONTH_SUFFIX.search(name)
+        if match is None:
+            continue
+        start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if _add_months(start, 1) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+def drop_partition(bind: Engine, table: str, name: str) -> bool:
+    """
+    Detach and drop one partition in its own transaction. Returns False if
+    the parent could not be locked within _DETACH_LOCK_TIMEOUT; the next run
+    tries again. DETACH ... CONCURRENTLY would avoid the lock, but Postgres
+    does not allow it while a DEFAULT partition exists.
+    """
+    try:
+        with bind.begin() as conn:
+            _lock(conn, table)
+            conn.execute(text(f"SET LOCAL lock_timeout = '{_DETACH_LOCK_TIMEOUT}'"))
+            conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+    except exc.OperationalError:
+        logger.warning("Could not lock %s to drop %s; retrying next run", table, name)
+        return False
+    return True
+
+
+def maintain_table(bind: Engine, table: str, now: datetime) -> Optional[dict]:
+    """
+    Create upcoming partitions of one table, then drop its expired ones.
+    Returns None if the table exists unpartitioned (created before partitioning).
+    """
+    with bind.begin() as conn:
+        _lock(conn, table)
+        if not _is_partitioned(conn, table):
+            logger.warning("Table %s is not partitioned; skipping partition maintenance", table)
+            return None
+        created = ensure_partitions(conn, table, now, settings.partition_precreate_months)
+        expired = expired_partitions(conn, table, now, settings.partition_retention_days)
+    dropped = [name for name in expired if drop_partition(bind, table, name)]
+    return {"created": created, "dropped": dropped}
+
+
+def run_maintenance(bind: Engine, now: Optional[datetime] = None) -> dict:
+    """
+    Maintain every partitioned table, each in its own transactions, so one
+    failing table does not hold back the others. Returns
+    {table: {"created": [...], "dropped": [...]}} for the tables maintained.
+    """
+    now = now or datetime.now(timezone.utc)
+    summary = {}
+    for table in partitioned_tables():
+        try:
+            changes = maintain_table(bind, table, now)
+        except Exception:
+            logger.exception("Partition maintenance of %s failed", table)
+            continue
+        if changes is None:
+            continue
+        summary[table] = changes
+        if changes["created"] or changes["dropped"]:
+            logger.info("Partitions of %s: created %s, dropped %s", table, changes["created"], changes["dropped"])
+    return summary
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _maintain(bind: Engine) -> None:
+    while True:
+        await asyncio.sleep(settings.partition_maintenance_interval)
+        try:
+            await asyncio.to_thread(run_maintenance, bind)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+
+
+def start(bind: Engine) -> None:
+    """
+    Re-run maintenance every PARTITION_MAINTENANCE_INTERVAL seconds on the running event loop.
+    """
+    global _task
+    if _task is None:
+        _task = asyncio.get_running_loop().create_task(_maintain(bind))
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
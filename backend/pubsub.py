@@ -0,0 +1,175 @@
+"""
+Cross-worker messages for Online Exam System
+
+Worker-local state (live update streams, caches) learns about writes made
+in other workers through Postgres LISTEN/NOTIFY. Each worker keeps one
+dedicated asyncpg connection that LISTENs on CHANNEL and sends this
+worker's messages. A message is a topic and a list of JSON items; the
+handlers subscribed to the topic run on the event loop of every other
+worker. Delivery is best effort: messages sent while a worker's connection
+is down are not replayed, so callers keep a TTL or similar fallback, or
+register an `on_resync` callback that drops state once the connection is
+back.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from . import metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "app_messages"
+# NOTIFY payloads must stay below 8000 bytes
+_MAX_PAYLOAD = 7000
+_RECONNECT_DELAY = 2.0
+# Messages waiting for the connection while it is down
+_OUTBOX_SIZE = 1000
+
+Handler = Callable[[list], None]
+Resync = Callable[[], None]
+
+MESSAGES = metrics.REGISTRY.register(metrics.Counter(
+    "pubsub_messages_total", "Messages exchanged with other workers", ("topic", "direction")
+))
+
+_handlers: Dict[str, List[Handler]] = {}
+_resyncs: List[Resync] = []
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_outbox: Optional["asyncio.Queue[tuple]"] = None
+
+
+def subscribe(topic: str) -> Callable[[Handler], Handler]:
+    """
+    Register a handler for the items other workers publish on `topic`. Usable as a decorator.
+    """
+    def register(handler: Handler) -> Handler:
+        _handlers.setdefault(topic, []).append(handler)
+        return handler
+    return register
+
+
+def on_resync(callback: Resync) -> Resync:
+    """
+    Register `callback` to run when the relay reconnects after losing its
+    connection, during which messages from other workers were missed.
+    Usable as a decorator.
+    """
+    _resyncs.append(callback)
+    return callback
+
+
+def publish(topic: str, items: list) -> None:
+    """
+    Send `items` to the other workers. Safe to call from any thread; a no-op
+    before `start`, e.g. in scripts and tests.
+    """
+    if items and _loop is not None:
+        _loop.call_soon_threadsafe(_enqueue, topic, items)
+
+
+def _enqueue(topic: str, items: list) -> None:
+    try:
+        _outbox.put_nowait((topic, items))
+    except asyncio.QueueFull:
+        MESSAGES.inc((topic, "dropped"))
+
+
+def _encode(topic: str, items: list) -> str:
+    return json.dumps({"topic": topic, "items": items}, separators=(",", ":"))
+
+
+def _payloads(topic: str, items: list) -> Iterable[str]:
+    chunk, size = [], 0
+    for item in items:
+        length = len(json.dumps(item, separators=(",", ":"))) + 1
+        if chunk and size + length > _MAX_PAYLOAD:
+            yield _encode(topic, chunk)
+            chunk, size = [], 0
+        chunk.append(item)
+        size += length
+    if chunk:
+        yield _encode(topic, chunk)
+
+
+def _on_notify(conn, pid, channel, payload) -> None:
+    # Our own NOTIFYs come back too; publishers handled them locally already
+    if pid == conn.get_server_pid():
+        return
+    try:
+        message = json.loads(payload)
+        topic, items = message["topic"], message["items"]
+    except (ValueError, TypeError, KeyError):
+        logger.warning("Ignoring malformed %s notification", CHANNEL)
+        return
+    MESSAGES.inc((topic, "in"))
+    for handler in list(_handlers.get(topic, ())):
+        try:
+            handler(items)
+        except Exception:
+            logger.exception("Handler %r for %s failed", handler, topic)
+
+
+def _resync() -> None:
+    for callback in list(_resyncs):
+        try:
+            callback()
+        except Exception:
+            logger.exception("Resync callback %r failed", callback)
+
+
+async def _relay() -> None:
+    url = make_url(settings.async_database_url).set(drivername="postgresql")
+    listened = False
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+            await conn.add_listener(CHANNEL, _on_notify)
+            if listened:
+                _resync()
+            listened = True
+            while True:
+                topic, items = await _outbox.get()
+                for payload in _payloads(topic, items):
+                    await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, payload)
+                MESSAGES.inc((topic, "out"))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Cross-worker relay failed; reconnecting")
+            await asyncio.sleep(_RECONNECT_DELAY)
+        finally:
+            if conn is not None:
+                await conn.close(timeout=5)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+def start() -> None:
+    """
+    Bind to the running event loop and start the relay.
+    """
+    global _task, _loop, _outbox
+    if _task is None:
+        _loop = asyncio.get_running_loop()
+        _outbox = asyncio.Queue(_OUTBOX_SIZE)
+        _task = _loop.create_task(_relay())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,106 @@
+"""
+Read replica lag checks for Online Exam System
+
+Every REPLICA_LAG_CHECK_INTERVAL seconds a background task commits a
+heartbeat row on the primary, then asks each replica for the commit time
+of the last transaction it replayed. The lag is how far that trails the
+heartbeat. Both timestamps come from the primary's clock, and the
+heartbeat keeps commits flowing while the application is idle, so a
+caught-up replica reads ~0 while one whose WAL receiver is down falls
+further behind with every check. A replica that is not streaming, was
+promoted, or cannot be reached is unusable until a later check says
+otherwise. Checks run in a worker thread, never inside a request.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import exc, func, text
+from sqlalchemy.dialects.postgresql import insert
+
+from . import models
+from .config import settings
+from .database import Replica, engine, replicas
+
+logger = logging.getLogger(__name__)
+
+_LAG_QUERY = text(
+    "SELECT pg_is_in_recovery(),"
+    " EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'),"
+    " pg_last_xact_replay_timestamp()"
+)
+
+
+def replication_lag(in_recovery: bool, streaming: bool, replayed_at: Optional[datetime],
+                    beat_at: Optional[datetime]) -> float:
+    """
+    Seconds the replica's last replayed commit trails the primary heartbeat;
+    inf when the lag cannot be trusted.
+    """
+    if not in_recovery or not streaming or replayed_at is None or beat_at is None:
+        # Promoted replicas no longer follow the primary; disconnected ones stopped replaying
+        return float("inf")
+    return max((beat_at - replayed_at).total_seconds(), 0.0)
+
+
+def beat() -> datetime:
+    """
+    Commit a heartbeat on the primary and return its timestamp.
+    """
+    HB = models.ReplicationHeartbeat
+    stmt = insert(HB).values(id=1, beat_at=func.clock_timestamp())
+    stmt = stmt.on_conflict_do_update(index_elements=[HB.id], set_={"beat_at": stmt.excluded.beat_at})
+    with engine.begin() as conn:
+        return conn.scalar(stmt.returning(HB.beat_at))
+
+
+def check(replica: Replica, beat_at: Optional[datetime]) -> None:
+    try:
+        with replica.engine.connect() as conn:
+            lag = replication_lag(*conn.execute(_LAG_QUERY).one(), beat_at)
+    except exc.DBAPIError:
+        lag = float("inf")
+    replica.lag = lag
+    replica.checked_at = time.monotonic()
+
+
+def check_all() -> None:
+    try:
+        beat_at = beat()
+    except exc.DBAPIError:
+        logger.warning("Replication heartbeat failed; replica lag is unknown")
+        beat_at = None
+    for replica in replicas:
+        check(replica, beat_at)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _run() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(check_all)
+        except Exception:
+            logger.exception("Replica lag check failed")
+        await asyncio.sleep(settings.replica_lag_check_interval)
+
+
+def start() -> None:
+    global _task
+    if replicas and _task is None:
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,200 @@
+"""
+Per-route request metrics for Online Exam System
+
+MetricsRoute wraps every API route handler to record request counts by
+status, latency, in-flight requests and the DB time spent per request.
+DB time is accumulated by engine cursor events into a per-request
+context variable. Everything is exposed in Prometheus text format.
+
+The same events count statements per request and flag requests that blow
+the statement budget or repeat one statement shape (the N+1 signature).
+"""
+
+import logging
+import re
+import time
+from collections import Counter as ShapeCounter
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from . import metrics
+from .config import settings
+from .database import async_engine, engine, pool_status
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_TOTAL = metrics.REGISTRY.register(metrics.Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+))
+REQUEST_DURATION = metrics.REGISTRY.register(metrics.LabeledHistogram(
+    "http_request_duration_seconds", "HTTP request handling latency", ("method", "route")
+))
+REQUESTS_IN_FLIGHT = metrics.REGISTRY.register(metrics.Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method", "route")
+))
+REQUEST_DB_TIME = metrics.REGISTRY.register(metrics.LabeledHistogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request", ("method", "route")
+))
+REQUEST_DB_STATEMENTS = metrics.REGISTRY.register(metrics.LabeledHistogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ("method", "route"),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+))
+QUERY_BUDGET_VIOLATIONS = metrics.REGISTRY.register(metrics.Counter(
+    "http_request_query_budget_violations_total", "Requests flagged by the SQL budget / N+1 detector", ("method", "route", "reason")
+))
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """
+    Raised in strict mode (QUERY_BUDGET_STRICT) when a request breaks the SQL budget.
+    """
+
+
+class RequestDBStats:
+    __slots__ = ("seconds", "statements", "shapes")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.statements = 0
+        self.shapes: ShapeCounter = ShapeCounter()
+
+
+_PLACEHOLDER_LIST = re.compile(r"(?:%\(\w+\)s|\$\d+)(?:\s*,\s*(?:%\(\w+\)s|\$\d+))*")
+
+def statement_shape(statement: str) -> str:
+    # Collapse bind parameters (and expanded IN lists) so repeats compare equal
+    return _PLACEHOLDER_LIST.sub("?", statement)
+
+
+# Mutable holder shared with threadpool workers (they run in a copy of the context)
+_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+    stats = _db_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.shapes[statement_shape(statement)] += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    stats = _db_stats.get()
+    if stats is not None:
+        stats.seconds += time.perf_counter() - start
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        _after_cursor_execute(conn, None, None, None, None, False)
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine, "handle_error", _handle_error)
+
+
+def check_query_budget(method: str, route: str, stats: RequestDBStats) -> None:
+    """
+    Log (and count) requests over the statement budget or repeating one
+    statement shape; raise QueryBudgetExceeded in strict mode.
+    """
+    problems = []
+    if settings.query_budget and stats.statements > settings.query_budget:
+        QUERY_BUDGET_VIOLATIONS.inc((method, route, "budget"))
+        problems.append(f"{stats.statements} statements (budget {settings.query_budget})")
+    if stats.shapes and settings.query_repeat_threshold:
+        shape, repeats = stats.shapes.most_common(1)[0]
+        if repeats >= settings.query_repeat_threshold:
+            QUERY_BUDGET_VIOLATIONS.inc((method, route, "repeated_statement"))
+            problems.append(f"statement repeated {repeats}x (possible N+1): {shape[:200]}")
+    if not problems:
+        return
+    message = f"{method} {route}: " + "; ".join(problems)
+    logger.warning("Query budget exceeded: %s", message)
+    if settings.query_budget_strict:
+        raise QueryBudgetExceeded(message)
+
+
+def _status_of(exc: Exception) -> int:
+    if isinstance(exc, HTTPException):
+        return exc.status_code
+    if isinstance(exc, RequestValidationError):
+        return 422
+    return 500
+
+
+class MetricsRoute(APIRoute):
+    """
+    APIRoute that labels metrics with the route template (e.g. /users/{user_id}),
+    keeping label cardinality bounded.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def instrumented_handler(request: Request) -> Response:
+            labels = (request.method, route)
+            stats = RequestDBStats()
+            token = _db_stats.set(stats)
+            REQUESTS_IN_FLIGHT.inc(labels)
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                check_query_budget(request.method, route, stats)
+                return response
+            except Exception as e:
+                status = _status_of(e)
+                raise
+            finally:
+                REQUEST_DURATION.observe(labels, time.perf_counter() - start)
+                REQUEST_DB_TIME.observe(labels, stats.seconds)
+                REQUEST_DB_STATEMENTS.observe(labels, stats.statements)
+                REQUESTS_IN_FLIGHT.dec(labels)
+                REQUESTS_TOTAL.inc((request.method, route, str(status)))
+                _db_stats.reset(token)
+
+        return instrumented_handler
+
+
+# --- Connection pool gauges, read at scrape time ---
+def _pool_gauge(key: str) -> Callable:
+    return lambda: {(name,): values[key] for name, values in pool_status().items()}
+
+for _key, _help in (
+    ("checked_out", "Connections currently checked out of the pool"),
+    ("checked_in", "Idle connections in the pool"),
+    ("overflow", "Connections open beyond pool_size (0 while within it)"),
+    ("timeouts", "Pool checkouts that timed out"),
+):
+    metrics.REGISTRY.register(metrics.CallbackGauge(f"db_pool_{_key}", _help, ("engine",), _pool_gauge(_key)))
+
+
+class _PoolWaitHistograms:
+    name = "db_pool_checkout_wait_seconds"
+    help = "Time waiting to check a connection out of the pool"
+    type = "histogram"
+
+    def render(self) -> list:
+        lines = []
+        for name, values in pool_status().items():
+            lines.extend(metrics.render_histogram(self.name, ("engine",), (name,), values["checkout_wait_seconds"]))
+        return lines
+
+metrics.REGISTRY.register(_PoolWaitHistograms())
+
+
+def render() -> str:
+    return metrics.REGISTRY.render()
@@ -0,0 +1,111 @@
+"""
+SubmissionResult change notifications for Online Exam System
+
+Views derived from submission results (student dashboards, ...) subscribe
+here instead of each hooking the ORM. Results written through a Session are
+published once the transaction commits; the grading dispatcher writes its
+results in bulk, which bypasses ORM events, and publishes them itself.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ResultEvent:
+    submission_id: UUID
+    student_id: UUID
+    exam_id: UUID
+    question_id: UUID
+    submitted_at: datetime
+    status: models.ExecutionStatus
+    score: int
+    max_score: int
+    execution_time: Optional[float] = None
+    memory_used: Optional[int] = None
+
+
+Subscriber = Callable[[List[ResultEvent]], None]
+_subscribers: List[Subscriber] = []
+
+
+def subscribe(callback: Subscriber) -> Subscriber:
+    """
+    Register `callback` for every committed batch of results. Usable as a decorator.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def publish(events: List[ResultEvent]) -> None:
+    if not events:
+        return
+    for callback in list(_subscribers):
+        try:
+            callback(events)
+        except Exception:
+            logger.exception("Result subscriber %r failed", callback)
+
+
+def build_events(rows: Iterable[dict], contexts: dict) -> List[ResultEvent]:
+    """
+    Pair result rows (submission_id, status, score, max_score and optionally
+    execution_time, memory_used) with the (student_id, question_id, exam_id,
+    submitted_at) context of their submission.
+    """
+    events = []
+    for row in rows:
+        context = contexts.get(row["submission_id"])
+        if context is None:
+            continue
+        events.append(ResultEvent(
+            submission_id=row["submission_id"],
+            student_id=context.student_id,
+            exam_id=context.exam_id,
+            question_id=context.question_id,
+            submitted_at=context.submitted_at,
+            status=row["status"],
+            score=row["score"],
+            max_score=row["max_score"],
+            execution_time=row.get("execution_time"),
+            memory_used=row.get("memory_used"),
+        ))
+    return events
+
+
+# --- Results written through the ORM ---
+# Contexts are resolved at flush time, while the transaction is still open,
+# and published after commit.
+@event.listens_for(Session, "after_flush")
+def _collect_result_writes(session, flush_context):
+    rows = [
+        {
+            "submission_id": obj.submission_id, "status": obj.status, "score": obj.score, "max_score": obj.max_score,
+            "execution_time": obj.execution_time, "memory_used": obj.memory_used,
+        }
+        for obj in (*session.new, *session.dirty)
+        if isinstance(obj, models.SubmissionResult) and obj.status != models.ExecutionStatus.RUNNING
+    ]
+    if rows:
+        contexts = crud.get_submission_contexts(session, {row["submission_id"] for row in rows})
+        session.info.setdefault("result_events", []).extend(build_events(rows, contexts))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_result_writes(session):
+    publish(session.info.pop("result_events", []))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_result_writes(session):
+    session.info.pop("result_events", None)
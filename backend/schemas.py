@@ -3,7 +3,7 @@ Pydantic schemas for Online Exam System
 Generated from SQLAlchemy models
 """
 
-from pydantic import BaseModel, validator
+from pydantic import VERSION, BaseModel, Field, IPvAnyAddress, create_model, validator
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from uuid import UUID
@@ -240,6 +240,19 @@ class Question(QuestionBase):
     class Config:
         orm_mode = True
 
+class QuestionSearchResult(BaseModel):
+    id: UUID
+    category_id: UUID
+    title: str
+    description: Optional[str] = None
+    difficulty: Difficulty
+    max_score: int
+    is_active: bool
+    rank: float
+
+    class Config:
+        orm_mode = True
+
 # QuestionTestCase schemas
 class QuestionTestCaseBase(BaseModel):
     input_data: str
@@ -397,6 +410,12 @@ class ExamSession(ExamSessionBase):
     class Config:
         orm_mode = True
 
+class ExamSessionProvisioning(BaseModel):
+    exam_id: UUID
+    approved: int
+    created: int
+    existing: int
+
 # Submission schemas
 class SubmissionBase(BaseModel):
     source_code: str
@@ -517,26 +536,27 @@ class ExamEvent(ExamEventBase):
 
 # AuditLog schemas
 class AuditLogBase(BaseModel):
-    action: str
-    resource_type: str
+    # Bounds match the audit_logs columns, so bad rows fail here, not in the writer
+    action: str = Field(..., max_length=100)
+    resource_type: str = Field(..., max_length=100)
     resource_id: Optional[UUID] = None
     old_values: Optional[Dict[str, Any]] = {}
     new_values: Optional[Dict[str, Any]] = {}
-    ip_address: Optional[str] = None
-    user_agent: Optional[str] = None
+    ip_address: Optional[IPvAnyAddress] = None
+    user_agent: Optional[str] = Field(None, max_length=500)
     extra_data: Optional[Dict[str, Any]] = {}
 
 class AuditLogCreate(AuditLogBase):
     user_id: Optional[UUID] = None
 
 class AuditLogUpdate(BaseModel):
-    action: Optional[str] = None
-    resource_type: Optional[str] = None
+    action: Optional[str] = Field(None, max_length=100)
+    resource_type: Optional[str] = Field(None, max_length=100)
     resource_id: Optional[UUID] = None
     old_values: Optional[Dict[str, Any]] = None
     new_values: Optional[Dict[str, Any]] = None
-    ip_address: Optional[str] = None
-    user_agent: Optional[str] = None
+    ip_address: Optional[IPvAnyAddress] = None
+    user_agent: Optional[str] = Field(None, max_length=500)
     extra_data: Optional[Dict[str, Any]] = None
 
 class AuditLog(AuditLogBase):
@@ -545,4 +565,151 @@ class AuditLog(AuditLogBase):
     created_at: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Batch ingestion schemas
+class BatchItemResult(BaseModel):
+    index: int
+    accepted: bool
+    id: Optional[UUID] = None
+    error: Optional[str] = None
+
+class BatchIngestResult(BaseModel):
+    accepted: int
+    rejected: int
+    items: List[BatchItemResult]
+
+# Exam paper bundle schemas
+class ExamPaperTestCase(BaseModel):
+    id: UUID
+    input_data: str
+    expected_output: str
+
+    class Config:
+        orm_mode = True
+
+class ExamPaperQuestion(BaseModel):
+    question_id: UUID
+    question_order: int
+    points: int
+    title: str
+    description: Optional[str] = None
+    problem_statement: str
+    difficulty: Difficulty
+    constraints: Optional[Dict[str, Any]] = {}
+    starter_code: Optional[Dict[str, Any]] = {}
+    max_score: int
+    time_limit_seconds: Optional[int] = None
+    sample_test_cases: List[ExamPaperTestCase] = []
+
+class ExamPaper(BaseModel):
+    version: str
+    exam: Exam
+    questions: List[ExamPaperQuestion]
+
+# Composite read schemas
+class QuestionWithSampleTests(Question):
+    test_cases: List[QuestionTestCase] = []
+
+class ExamQuestionWithQuestion(ExamQuestion):
+    question: QuestionWithSampleTests
+
+class ExamWithQuestions(Exam):
+    exam_questions: List[ExamQuestionWithQuestion] = []
+
+class SubmissionWithDetails(Submission):
+    submission_results: List[SubmissionResult] = []
+    submission_events: List[SubmissionEvent] = []
+
+# Student dashboard schemas
+class DashboardQuestion(BaseModel):
+    question_id: UUID
+    best_score: int
+    max_score: int
+    points: Optional[int] = None
+    attempts: int
+    accepted: int
+    pass_rate: float
+
+class DashboardExam(BaseModel):
+    exam_id: UUID
+    title: str
+    total_score: int
+    max_score: int
+    attempts: int
+    questions_attempted: int
+    questions_passed: int
+    pass_rate: float
+    questions: List[DashboardQuestion]
+
+class StudentDashboard(BaseModel):
+    student_id: UUID
+    total_score: int
+    max_score: int
+    attempts: int
+    pass_rate: float
+    exams: List[DashboardExam]
+
+# Leaderboard schemas
+class LeaderboardEntry(BaseModel):
+    rank: int
+    student_id: UUID
+    score: int
+    penalty: int
+    solved: int
+
+class Leaderboard(BaseModel):
+    exam_id: UUID
+    participants: int
+    entries: List[LeaderboardEntry]
+
+# Heartbeat schemas
+class IdleSession(BaseModel):
+    session_id: UUID
+    student_id: UUID
+    last_activity_at: datetime
+    idle_seconds: float
+
+# Session token validation schemas
+class ValidatedSession(BaseModel):
+    id: UUID
+    user_id: UUID
+    exam_id: Optional[UUID] = None
+    status: Optional[SessionStatus] = None
+    expires_at: Optional[datetime] = None
+
+# Partial response schemas for sparse fieldsets (`?fields=`)
+# Every field is optional; routes serialize them with exclude_unset so that
+# only the selected columns appear in the response.
+PYDANTIC_V2 = VERSION.startswith("2.")
+
+class PartialBase(BaseModel):
+    class Config:
+        orm_mode = True
+
+def _annotation(field):
+    # Declared type: `annotation` in pydantic 2, `outer_type_` in pydantic 1
+    return field.annotation if PYDANTIC_V2 else field.outer_type_
+
+def partial(schema):
+    fields = {name: (Optional[_annotation(field)], None) for name, field in schema.__fields__.items()}
+    return create_model(f"{schema.__name__}Partial", __base__=PartialBase, **fields)
+
+UserPartial = partial(User)
+UserSessionPartial = partial(UserSession)
+UserTokenPartial = partial(UserToken)
+StudentProfilePartial = partial(StudentProfile)
+StudentExamQuestionPartial = partial(StudentExamQuestion)
+TeacherProfilePartial = partial(TeacherProfile)
+QuestionCategoryPartial = partial(QuestionCategory)
+QuestionPartial = partial(Question)
+QuestionTestCasePartial = partial(QuestionTestCase)
+ExamPartial = partial(Exam)
+ExamQuestionPartial = partial(ExamQuestion)
+ExamRegistrationPartial = partial(ExamRegistration)
+ExamSessionPartial = partial(ExamSession)
+SubmissionPartial = partial(Submission)
+SubmissionResultPartial = partial(SubmissionResult)
+SubmissionEventPartial = partial(SubmissionEvent)
+ExamEventPartial = partial(ExamEvent)
+AuditLogPartial = partial(AuditLog)
\ No newline at end of file
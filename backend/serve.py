@@ -0,0 +1,137 @@
+"""
+Pre-fork server entry point for Online Exam System
+
+    python -m backend.serve [--host 0.0.0.0] [--port 8000] [--workers N]
+
+The master binds the listening socket and imports the app once (preload),
+then forks N uvicorn workers (WEB_CONCURRENCY, default: CPU count) that
+share the socket. Each child discards the connection pools inherited from
+the master before serving. On SIGTERM/SIGINT the master forwards SIGTERM;
+workers stop accepting, finish in-flight requests and run shutdown hooks
+within GRACEFUL_TIMEOUT seconds, after which they are killed. Workers that
+die unexpectedly are replaced.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+from .config import settings
+
+logger = logging.getLogger("backend.serve")
+
+# Extra time after GRACEFUL_TIMEOUT before stragglers are killed
+_KILL_GRACE = 5.0
+_RESPAWN_DELAY = 1.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve_child(app, sock: socket.socket, args: argparse.Namespace) -> None:
+    # The master's handlers must not run in the child; uvicorn installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from .database import reset_after_fork
+    reset_after_fork()
+    config = uvicorn.Config(
+        app,
+        access_log=args.access_log,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Master:
+    def __init__(self, app, sock: socket.socket, args: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_child(self.app, self.sock, self.args)
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def _on_signal(self, signum, frame) -> None:
+        if not self.stopping:
+            logger.info("Received %s; draining %d workers", signal.Signals(signum).name, len(self.workers))
+            self.stopping = True
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for _ in range(self.args.workers):
+            self.spawn()
+        deadline = None
+        while self.workers:
+            if self.stopping and deadline is None:
+                for pid in self.workers:
+                    os.kill(pid, signal.SIGTERM)
+                deadline = time.monotonic() + settings.graceful_timeout + _KILL_GRACE
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                started = self.workers.pop(pid, None)
+                if started is not None and not self.stopping:
+                    logger.warning("Worker %d exited with status %d; replacing it", pid, os.waitstatus_to_exitcode(status))
+                    if time.monotonic() - started < _RESPAWN_DELAY:
+                        time.sleep(_RESPAWN_DELAY)
+                    self.spawn()
+                continue
+            if deadline is not None and time.monotonic() > deadline:
+                for pid in self.workers:
+                    logger.warning("Worker %d did not drain in time; killing it", pid)
+                    os.kill(pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(0.1)
+        self.sock.close()
+        logger.info("All workers stopped")
+        return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.serve", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency or os.cpu_count() or 1)
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+
+    sock = _bind(args.host, args.port)
+    # Preload: import the app (and its engines, which connect lazily) once in the master
+    from .main import app
+    logger.info("Serving on %s:%d with %d workers", args.host, args.port, args.workers)
+    return Master(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Session token validation cache for Online Exam System
+
+Resolves UserSession / ExamSession tokens without a DB round trip on the
+hot path. Valid sessions are cached for SESSION_CACHE_TTL seconds, never
+past their expires_at; unknown or unusable tokens are cached negatively for
+SESSION_CACHE_NEGATIVE_TTL. Any commit that creates, changes or deletes a
+session row evicts its tokens in this worker and, through pubsub, in the
+others; SESSION_CACHE_TTL only bounds staleness while that relay is down.
+Entries are keyed by a SHA-256 digest of the token, so the evictions
+broadcast over the database never carry a usable token.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import async_crud, models, pubsub, schemas
+from .cache import TTLCache
+from .config import settings
+
+# Exam sessions that still accept requests
+USABLE_EXAM_STATUSES = {models.SessionStatus.ACTIVE, models.SessionStatus.PAUSED}
+
+TOPIC = "session_evictions"
+
+_INVALID = object()
+_user_sessions = TTLCache(maxsize=settings.session_cache_size)
+_exam_sessions = TTLCache(maxsize=settings.session_cache_size)
+_caches = {"user": _user_sessions, "exam": _exam_sessions}
+
+def _key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _ttl_until(expires_at: Optional[datetime]) -> float:
+    if expires_at is None:
+        return settings.session_cache_ttl
+    return min(settings.session_cache_ttl, (expires_at - datetime.now(timezone.utc)).total_seconds())
+
+async def validate_user_session(db: AsyncSession, token: str) -> Optional[schemas.ValidatedSession]:
+    key = _key(token)
+    cached = _user_sessions.get(key)
+    if cached is _INVALID:
+        return None
+    if cached is not None:
+        return cached
+    db_session = await async_crud.get_user_session_by_token(db, token)
+    ttl = _ttl_until(db_session.expires_at) if db_session is not None else 0
+    if ttl <= 0:
+        _user_sessions.set(key, _INVALID, settings.session_cache_negative_ttl)
+        return None
+    validated = schemas.ValidatedSession(id=db_session.id, user_id=db_session.user_id, expires_at=db_session.expires_at)
+    _user_sessions.set(key, validated, ttl)
+    return validated
+
+async def validate_exam_session(db: AsyncSession, token: str) -> Optional[schemas.ValidatedSession]:
+    key = _key(token)
+    cached = _exam_sessions.get(key)
+    if cached is _INVALID:
+        return None
+    if cached is not None:
+        return cached
+    db_session = await async_crud.get_exam_session_by_token(db, token)
+    if db_session is None or db_session.status not in USABLE_EXAM_STATUSES:
+        _exam_sessions.set(key, _INVALID, settings.session_cache_negative_ttl)
+        return None
+    validated = schemas.ValidatedSession(
+        id=db_session.id, user_id=db_session.student_id, exam_id=db_session.exam_id, status=db_session.status
+    )
+    _exam_sessions.set(key, validated, settings.session_cache_ttl)
+    return validated
+
+def evict_user_session(token: str) -> None:
+    _user_sessions.pop(_key(token))
+
+def evict_exam_session(token: str) -> None:
+    _exam_sessions.pop(_key(token))
+
+def stats() -> dict:
+    return {"user_sessions": _user_sessions.stats(), "exam_sessions": _exam_sessions.stats()}
+
+# --- Eviction on writes ---
+# Covers status changes (TERMINATED/COMPLETED), token rotation, expiry edits,
+# deletes, and new rows whose token may sit in the negative cache.
+def _tokens(obj) -> set:
+    history = inspect(obj).attrs.session_token.history
+    return {t for t in (obj.session_token, *history.deleted) if t}
+
+@event.listens_for(Session, "after_flush")
+def _collect_session_writes(session, flush_context):
+    touched = session.info.setdefault("session_tokens_touched", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.UserSession):
+            touched.update(("user", _key(t)) for t in _tokens(obj))
+        elif isinstance(obj, models.ExamSession):
+            touched.update(("exam", _key(t)) for t in _tokens(obj))
+
+@event.listens_for(Session, "after_commit")
+def _evict_session_writes(session):
+    touched = session.info.pop("session_tokens_touched", ())
+    for kind, key in touched:
+        _caches[kind].pop(key)
+    pubsub.publish(TOPIC, [[kind, key] for kind, key in touched])
+
+@pubsub.subscribe(TOPIC)
+def _evict_relayed(items: list) -> None:
+    for kind, key in items:
+        if kind in _caches:
+            _caches[kind].pop(key)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_session_writes(session):
+    session.info.pop("session_tokens_touched", None)
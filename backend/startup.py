@@ -0,0 +1,155 @@
+"""
+Startup sequence support for Online Exam System
+
+- Schema fingerprint: a hash of the DDL the models would emit is stored in
+  the schema_version table. Workers whose models match it skip
+  `create_all` and its per-table catalog inspection entirely. When it does
+  not match, tables that already exist are compared with the live catalog
+  and get their missing columns, indexes and enum values before the new
+  fingerprint is recorded.
+- Phase timing: each startup phase is timed and logged.
+- Readiness: set once startup has finished, cleared when shutdown begins,
+  and reported by the readiness probe together with a DB check.
+"""
+
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Enum, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Kept out of models.Base.metadata so it does not feed its own fingerprint
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+# pg_advisory_xact_lock key so only one booting worker runs the DDL
+_ADVISORY_LOCK_KEY = 0x73636865
+
+phases: Dict[str, float] = {}
+_ready = False
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = round(time.perf_counter() - start, 4)
+        logger.info("Startup phase %s took %.3fs", name, phases[name])
+
+
+def mark_ready() -> None:
+    global _ready
+    _ready = True
+    logger.info("Startup complete in %.3fs: %s", sum(phases.values()), phases)
+
+
+def mark_not_ready() -> None:
+    global _ready
+    _ready = False
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def schema_fingerprint(metadata: MetaData = models.Base.metadata) -> str:
+    """
+    sha256 of the PostgreSQL DDL for every table and index, plus enum values
+    (which the CREATE TABLE text does not spell out).
+    """
+    dialect = postgresql.dialect()
+    parts = []
+    for table in metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            parts.append(str(CreateIndex(index).compile(dialect=dialect)))
+        for column in table.columns:
+            if isinstance(column.type, Enum):
+                parts.append(f"{table.name}.{column.name}: {column.type.enums}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _stored_fingerprint(conn) -> Optional[str]:
+    if conn.scalar(text("SELECT to_regclass('schema_version')")) is None:
+        return None
+    return conn.scalar(select(schema_version.c.fingerprint).where(schema_version.c.id == 1))
+
+
+def schema_drift(conn) -> List[str]:
+    """
+    DDL that brings existing tables up to the models: `create_all` only
+    creates missing tables, so columns, indexes and enum values added to a
+    model since are found here by comparing with the live catalog. Changed
+    column types or removed objects are not detected.
+    """
+    dialect = conn.dialect
+    inspector = inspect(conn)
+    live_enums = {enum["name"]: list(enum["labels"]) for enum in inspector.get_enums()}
+    ddl = []
+    for table in models.Base.metadata.sorted_tables:
+        live_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if isinstance(column.type, Enum) and column.type.name in live_enums:
+                labels = live_enums[column.type.name]
+                for label in column.type.enums:
+                    if label not in labels:
+                        ddl.append(f"ALTER TYPE {column.type.name} ADD VALUE IF NOT EXISTS '{label}'")
+                        labels.append(label)
+            if column.name not in live_columns:
+                if isinstance(column.type, Enum) and column.type.name not in live_enums:
+                    ddl.append(str(postgresql.CreateEnumType(column.type).compile(dialect=dialect)))
+                    live_enums[column.type.name] = list(column.type.enums)
+                ddl.append(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=dialect)}")
+        live_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in live_indexes:
+                ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return ddl
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """
+    Create missing tables and apply `schema_drift` unless the stored
+    fingerprint already matches the models. A failing statement aborts
+    startup without recording the fingerprint. Returns True if DDL ran.
+    """
+    fingerprint = schema_fingerprint()
+    with engine.connect() as conn:
+        if _stored_fingerprint(conn) == fingerprint:
+            logger.info("Schema fingerprint %s matches; skipping create_all", fingerprint[:12])
+            return False
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        # Another worker may have finished while we waited for the lock
+        if _stored_fingerprint(conn) == fingerprint:
+            return False
+        models.Base.metadata.create_all(bind=conn)
+        for statement in schema_drift(conn):
+            logger.warning("Schema drift: %s", statement)
+            # Not text(): "::" casts in computed columns would read as bind parameters
+            conn.exec_driver_sql(statement)
+        schema_version.create(bind=conn, checkfirst=True)
+        conn.execute(
+            insert(schema_version)
+            .values(id=1, fingerprint=fingerprint)
+            .on_conflict_do_update(index_elements=["id"], set_={"fingerprint": fingerprint, "applied_at": func.now()})
+        )
+    logger.info("Schema created/updated; stored fingerprint %s", fingerprint[:12])
+    return True
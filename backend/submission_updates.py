@@ -0,0 +1,205 @@
+"""
+Live submission updates for Online Exam System
+
+Instead of polling GET /submissions/{id}, a client keeps one Server-Sent
+Events stream open per student (GET /students/{id}/submission-updates) and
+receives a "status" event whenever one of the student's submissions changes
+Submission.status, and a "result" event with the summary of each final
+SubmissionResult.
+
+Each worker runs one hub that maps student ids to their open streams, so
+publishing a batch costs a single hand-off to the event loop plus one queue
+put per stream that wants it. A stream that falls SSE_QUEUE_SIZE updates
+behind is ended with a "lagged" event and the client reconnects. Grading
+runs in every worker, so each batch is also relayed to the other workers
+(see pubsub).
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import metrics, models, pubsub, result_events
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TOPIC = "submission_updates"
+# Sent as the SSE retry field: how soon clients reconnect
+_RECONNECT_DELAY = 2.0
+
+LAGGED = metrics.REGISTRY.register(metrics.Counter("sse_streams_lagged_total", "Update streams ended for falling behind"))
+
+
+@dataclass(frozen=True)
+class Update:
+    kind: str  # "status" or "result"
+    student_id: str
+    data: dict
+
+
+def status_update(submission_id: UUID, student_id: UUID, status: models.SubmissionStatus) -> Update:
+    return Update("status", str(student_id), {"submission_id": str(submission_id), "status": status.value})
+
+
+def result_update(event: result_events.ResultEvent) -> Update:
+    return Update("result", str(event.student_id), {
+        "submission_id": str(event.submission_id),
+        "question_id": str(event.question_id),
+        "status": event.status.value,
+        "score": event.score,
+        "max_score": event.max_score,
+        "execution_time": event.execution_time,
+        "memory_used": event.memory_used,
+    })
+
+
+class Stream:
+    def __init__(self, student_id: str, maxsize: int):
+        self.student_id = student_id
+        self.queue: "asyncio.Queue[Update]" = asyncio.Queue(maxsize)
+        self.lagged = False
+
+
+class Hub:
+    """
+    Open streams of this worker, keyed by student. Everything except
+    `publish` runs on the event loop.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._streams: Dict[str, Set[Stream]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(streams) for streams in self._streams.values())
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    def open(self, student_id: UUID) -> Stream:
+        stream = Stream(str(student_id), settings.sse_queue_size)
+        self._streams.setdefault(stream.student_id, set()).add(stream)
+        return stream
+
+    def close(self, stream: Stream) -> None:
+        streams = self._streams.get(stream.student_id)
+        if streams is not None:
+            streams.discard(stream)
+            if not streams:
+                del self._streams[stream.student_id]
+
+    def deliver(self, updates: Iterable[Update]) -> None:
+        for update in updates:
+            for stream in list(self._streams.get(update.student_id, ())):
+                try:
+                    stream.queue.put_nowait(update)
+                except asyncio.QueueFull:
+                    stream.lagged = True
+                    self.close(stream)
+                    LAGGED.inc()
+
+    def publish(self, updates: List[Update]) -> None:
+        """
+        Deliver to this worker's streams and relay the batch to the other
+        workers. Safe to call from any thread; a no-op before `bind`.
+        """
+        if not updates or self.loop is None:
+            return
+        # Always via the loop's FIFO, so batches from threads and from the loop keep their order
+        self.loop.call_soon_threadsafe(self._publish, updates)
+
+    def _publish(self, updates: List[Update]) -> None:
+        self.deliver(updates)
+        pubsub.publish(TOPIC, [asdict(update) for update in updates])
+
+
+hub = Hub()
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    "sse_streams_open", "Open submission update streams", (), lambda: {(): len(hub)}
+))
+
+
+def publish(updates: List[Update]) -> None:
+    hub.publish(updates)
+
+
+@result_events.subscribe
+def _on_results(events: List[result_events.ResultEvent]) -> None:
+    publish([result_update(event) for event in events])
+
+
+# --- Submission.status changes made through the ORM ---
+# Bulk status UPDATEs bypass these events; their callers publish themselves.
+@event.listens_for(Session, "after_flush")
+def _collect_status_changes(session, flush_context):
+    updates = [
+        status_update(obj.id, obj.student_id, obj.status or models.SubmissionStatus.PENDING)
+        for obj in (*session.new, *session.dirty)
+        if isinstance(obj, models.Submission)
+        and (obj in session.new or inspect(obj).attrs.status.history.has_changes())
+    ]
+    if updates:
+        session.info.setdefault("submission_updates", []).extend(updates)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_status_changes(session):
+    publish(session.info.pop("submission_updates", []))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_status_changes(session):
+    session.info.pop("submission_updates", None)
+
+
+# --- Server-Sent Events ---
+def _format(kind: str, data: dict) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream(student_id: UUID) -> AsyncIterator[str]:
+    """
+    SSE body for one student's updates. Ends with a "lagged" event if the
+    client cannot keep up; the stream is unregistered when the client goes away.
+    """
+    subscription = hub.open(student_id)
+    try:
+        yield f"retry: {int(_RECONNECT_DELAY * 1000)}\n\n"
+        while True:
+            if subscription.lagged and subscription.queue.empty():
+                yield _format("lagged", {"detail": "Too many pending updates; reconnect and refetch"})
+                return
+            try:
+                update = await asyncio.wait_for(subscription.queue.get(), settings.sse_keepalive_seconds)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield _format(update.kind, update.data)
+    finally:
+        hub.close(subscription)
+
+
+# --- Updates relayed from other workers ---
+@pubsub.subscribe(TOPIC)
+def _on_relayed(items: list) -> None:
+    try:
+        updates = [Update(**item) for item in items]
+    except TypeError:
+        logger.warning("Ignoring malformed %s message", TOPIC)
+        return
+    hub.deliver(updates)
+
+
+def start() -> None:
+    """
+    Bind the hub to the running event loop.
+    """
+    hub.bind(asyncio.get_running_loop())
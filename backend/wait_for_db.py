@@ -1,13 +1,17 @@
+import random
 import time
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.engine import Engine
 
-def wait_for_db(engine: Engine, timeout: int = 60, interval: float = 1.5) -> None:
+def wait_for_db(engine: Engine, timeout: int = 60, initial_interval: float = 0.1, max_interval: float = 5.0) -> None:
     """
-    Poll the database until it's ready or until timeout.
+    Poll the database until it's ready or until timeout. The delay between
+    attempts doubles from initial_interval up to max_interval, with jitter so
+    that many workers booting together do not retry in lockstep.
     """
     deadline = time.time() + timeout
+    interval = initial_interval
     last_err: Exception | None = None
     while time.time() < deadline:
         try:
@@ -16,5 +20,6 @@ def wait_for_db(engine: Engine, timeout: int = 60, interval: float = 1.5) -> Non
             return
         except OperationalError as e:
             last_err = e
-            time.sleep(interval)
+            time.sleep(min(random.uniform(interval / 2, interval), max(0.0, deadline - time.time())))
+            interval = min(interval * 2, max_interval)
     raise RuntimeError(f"Database not ready after {timeout}s") from last_err
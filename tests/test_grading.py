@@ -0,0 +1,232 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from backend import async_crud, grading, grading_cache, models, result_events, submission_updates
+from backend.cache import LRUCache
+
+S = models.SubmissionStatus
+E = models.ExecutionStatus
+
+
+class FakeJudge0:
+    """Judge0 batch API in memory; tokens in `verdicts` get that status, unknown tokens come back null."""
+
+    def __init__(self):
+        self.submitted = []
+        self.verdicts = {}
+        self.dropped = 0
+        self._next = 0
+
+    async def submit_batch(self, payloads):
+        self.submitted.extend(payloads)
+        tokens = []
+        for _ in payloads:
+            self._next += 1
+            token = f"t{self._next}"
+            self.verdicts[token] = {"token": token, "status_id": grading._IN_QUEUE}
+            tokens.append({"token": token})
+        return tokens[:len(tokens) - self.dropped]
+
+    async def get_batch(self, tokens):
+        return [self.verdicts.get(token) for token in tokens]
+
+    def finish(self, token, status_id=grading._ACCEPTED):
+        self.verdicts[token] = {"token": token, "status_id": status_id, "time": "0.01", "memory": 1024, "stdout": None}
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeStore:
+    """The async_crud calls the dispatcher makes, over plain objects."""
+
+    def __init__(self, monkeypatch):
+        self.questions, self.submissions, self.results = {}, {}, {}
+        for name in (
+            "claim_pending_submissions", "lock_unresulted_submissions", "get_questions_by_ids",
+            "get_test_cases_by_question", "create_submission_results_bulk", "claim_running_results",
+            "lock_running_results", "update_submission_results_bulk", "set_submissions_status",
+            "get_submission_contexts", "get_graded_results",
+        ):
+            monkeypatch.setattr(async_crud, name, getattr(self, name))
+
+    def add_submission(self, time_limit=30):
+        question = SimpleNamespace(id=uuid4(), max_score=10, time_limit_seconds=time_limit, memory_limit_mb=256)
+        submission = SimpleNamespace(
+            id=uuid4(), student_id=uuid4(), question_id=question.id, language="python",
+            source_code=f"print({uuid4().int})", status=S.PENDING,
+        )
+        self.questions[question.id] = question
+        self.submissions[submission.id] = submission
+        return submission
+
+    def result_of(self, submission):
+        return next(r for r in self.results.values() if r.submission_id == submission.id)
+
+    async def claim_pending_submissions(self, db, limit, stale_after):
+        claimed = [s for s in self.submissions.values() if s.status == S.PENDING][:limit]
+        for submission in claimed:
+            submission.status = S.RUNNING
+        return claimed
+
+    async def lock_unresulted_submissions(self, db, ids):
+        resulted = {r.submission_id for r in self.results.values()}
+        return {id for id in ids if self.submissions[id].status == S.RUNNING and id not in resulted}
+
+    async def get_questions_by_ids(self, db, ids):
+        return {id: self.questions[id] for id in ids}
+
+    async def get_test_cases_by_question(self, db, ids):
+        return {id: [] for id in ids}
+
+    async def create_submission_results_bulk(self, db, rows):
+        for row in rows:
+            fields = {"id": uuid4(), "created_at": datetime.now(timezone.utc), "test_results": None, "extra_data": None, "grading_key": None}
+            result = SimpleNamespace(**{**fields, **row})
+            self.results[result.id] = result
+
+    async def get_graded_results(self, db, keys, statuses, fields):
+        latest = {}
+        for result in self.results.values():
+            if result.grading_key in keys and result.status in statuses:
+                latest[result.grading_key] = {field: getattr(result, field, None) for field in fields}
+        return latest
+
+    async def claim_running_results(self, db, limit, lease):
+        return [r for r in self.results.values() if r.status == E.RUNNING][:limit]
+
+    async def lock_running_results(self, db, ids):
+        return {id for id in ids if self.results[id].status == E.RUNNING}
+
+    async def update_submission_results_bulk(self, db, rows):
+        for row in rows:
+            vars(self.results[row["id"]]).update(row)
+
+    async def set_submissions_status(self, db, ids, status):
+        for id in ids:
+            self.submissions[id].status = status
+
+    async def get_submission_contexts(self, db, ids):
+        return {
+            id: SimpleNamespace(
+                id=id, student_id=self.submissions[id].student_id, question_id=self.submissions[id].question_id,
+                exam_id=uuid4(), submitted_at=datetime.now(timezone.utc),
+            )
+            for id in ids
+        }
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(grading_cache, "_results", LRUCache(maxsize=100))
+    monkeypatch.setattr(submission_updates, "publish", lambda updates: None)
+    monkeypatch.setattr(result_events, "publish", lambda events: None)
+    return FakeStore(monkeypatch)
+
+
+@pytest.fixture
+def judge():
+    return FakeJudge0()
+
+
+def dispatcher(judge, **kwargs):
+    return grading.GradingDispatcher(judge, batch_size=5, poll_interval=0, session_factory=FakeSession, **kwargs)
+
+
+def test_dispatch_sends_clamped_batch_and_records_tokens(store, judge):
+    submission = store.add_submission(time_limit=30)
+
+    assert asyncio.run(dispatcher(judge).dispatch_once()) == 1
+
+    assert judge.submitted[0]["cpu_time_limit"] == 15
+    result = store.result_of(submission)
+    assert result.status == E.RUNNING
+    assert [case["token"] for case in result.test_results["cases"]] == ["t1"]
+    assert submission.status == S.RUNNING
+
+
+def test_poll_grades_finished_tokens_and_counts_them(store, judge):
+    submission = store.add_submission()
+    grader = dispatcher(judge)
+    asyncio.run(grader.dispatch_once())
+
+    # Still queued: nothing written, so the loop should back off
+    assert asyncio.run(grader.poll_once()) == 0
+
+    judge.finish("t1")
+    assert asyncio.run(grader.poll_once()) == 1
+    result = store.result_of(submission)
+    assert result.status == E.ACCEPTED
+    assert result.score == 10
+    assert submission.status == S.COMPLETED
+
+
+def test_poll_fails_tokens_the_judge_forgot(store, judge):
+    submission = store.add_submission()
+    grader = dispatcher(judge)
+    asyncio.run(grader.dispatch_once())
+    judge.verdicts.clear()
+
+    assert asyncio.run(grader.poll_once()) == 1
+    result = store.result_of(submission)
+    assert result.status == E.INTERNAL_ERROR
+    assert "no longer knows" in result.stderr
+    assert submission.status == S.ERROR
+
+
+def test_poll_fails_results_stuck_past_the_timeout(store, judge):
+    stuck, fresh = store.add_submission(), store.add_submission()
+    grader = dispatcher(judge, timeout=60)
+    asyncio.run(grader.dispatch_once())
+    store.result_of(stuck).created_at -= timedelta(seconds=61)
+
+    assert asyncio.run(grader.poll_once()) == 1
+    assert store.result_of(stuck).status == E.INTERNAL_ERROR
+    assert stuck.status == S.ERROR
+    assert store.result_of(fresh).status == E.RUNNING
+    assert fresh.status == S.RUNNING
+
+
+def test_dispatch_reuses_a_result_graded_elsewhere(store, judge):
+    first = store.add_submission()
+    grader = dispatcher(judge)
+    asyncio.run(grader.dispatch_once())
+    judge.finish("t1")
+    asyncio.run(grader.poll_once())
+    # Another worker's cache: only the table knows the grading
+    grading_cache._results.clear()
+
+    again = store.add_submission()
+    again.question_id, again.source_code = first.question_id, first.source_code
+    assert asyncio.run(grader.dispatch_once()) == 1
+
+    assert len(judge.submitted) == 1
+    result = store.result_of(again)
+    assert result.status == E.ACCEPTED
+    assert result.extra_data == {"cached": True}
+    assert again.status == S.COMPLETED
+
+
+def test_dispatch_releases_submissions_the_judge_returned_too_few_tokens_for(store, judge):
+    submissions = [store.add_submission() for _ in range(2)]
+    judge.dropped = 1
+
+    assert asyncio.run(dispatcher(judge).dispatch_once()) == 2
+
+    assert store.results == {}
+    assert [s.status for s in submissions] == [S.PENDING, S.PENDING]
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+
+from backend import database, replication
+
+
+def request(method="GET", cookie=None):
+    headers = [(b"cookie", f"{database.READ_YOUR_WRITES_COOKIE}={cookie}".encode())] if cookie else []
+    return Request({"type": "http", "method": method, "path": "/", "headers": headers, "query_string": b""})
+
+
+def replica(name, lag, checked_ago=0.0):
+    return SimpleNamespace(name=name, lag=lag, checked_at=time.monotonic() - checked_ago, session_factory=name)
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = database.ReadRouter([replica("r0", 0.1), replica("r1", 9.0)], max_lag=5, check_interval=2)
+    monkeypatch.setattr(database, "read_router", router)
+    return router
+
+
+def test_safe_reads_go_to_replicas_within_the_lag_limit(router):
+    router.replicas.append(replica("r2", 0.0))
+    picked = {database.session_factory_for(request()) for _ in range(4)}
+    assert picked == {"r0", "r2"}
+
+
+def test_writes_and_recent_writers_use_the_primary(router):
+    assert database.session_factory_for(request("POST")) is database.SessionLocal
+
+    response, session = Response(), SimpleNamespace(info={})
+    database._mark_write(request("POST"), response, session)
+    assert "set-cookie" not in response.headers
+    database._pin_to_primary(session)
+    until = response.headers["set-cookie"].split(";")[0].split("=")[1]
+    assert database.session_factory_for(request(cookie=until)) is database.SessionLocal
+    assert database.session_factory_for(request(cookie=time.time() - 1)) == "r0"
+
+
+def test_falls_back_to_the_primary_when_no_replica_is_usable(router):
+    router.replicas[0].lag = float("inf")
+    assert database.session_factory_for(request()) is database.SessionLocal
+
+
+def test_stale_lag_checks_are_not_trusted(router):
+    router.replicas[0].checked_at -= 60
+    assert database.session_factory_for(request()) is database.SessionLocal
+
+
+def test_replication_lag_trails_the_primary_heartbeat():
+    beat_at = datetime(2024, 5, 1, 12, 0, 10, tzinfo=timezone.utc)
+    replayed = beat_at - timedelta(seconds=7)
+    assert replication.replication_lag(True, True, replayed, beat_at) == 7
+    # Replayed the heartbeat itself (commit lands just after the statement clock)
+    assert replication.replication_lag(True, True, beat_at + timedelta(milliseconds=2), beat_at) == 0
+
+
+@pytest.mark.parametrize("in_recovery, streaming, replayed_at, beat_at", [
+    (True, False, datetime.now(timezone.utc), datetime.now(timezone.utc)),  # WAL receiver disconnected
+    (False, False, None, datetime.now(timezone.utc)),  # promoted
+    (True, True, None, datetime.now(timezone.utc)),  # nothing replayed yet
+    (True, True, datetime.now(timezone.utc), None),  # primary heartbeat failed
+])
+def test_replication_lag_is_unknown_when_it_cannot_be_trusted(in_recovery, streaming, replayed_at, beat_at):
+    assert replication.replication_lag(in_recovery, streaming, replayed_at, beat_at) == float("inf")